@@ -0,0 +1,137 @@
+# Batch classification of many Agrolab reports in one run
+#
+# Usage:
+#   python batch.py reports/ -o ergebnis.csv
+#   python batch.py "reports/**/*.xlsx" -o ergebnis.parquet --subcategory Ton --fremdbestandteile no --workers 8
+#   python batch.py reports/ -o ergebnis.csv --profile profile.json
+#   python batch.py reports/ -o ergebnis.csv --history bmf_history.sqlite
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import pyarrow as pa
+
+from classification import subcategory_options
+from export import export_schema, open_table_writer, write_table_frame, close_table_writer
+from history import open_history, record_report, close_history
+from ingestion import read_report, file_hash
+from pipeline import classify_report
+from profiling import new_profiler
+from reference import load_reference
+from workers import init_worker, worker_reference
+
+
+# Directory (all .xlsx inside) or glob pattern -> sorted list of report files
+def find_reports(source):
+    if os.path.isdir(source):
+        source = os.path.join(source, '*.xlsx')
+    # Skip the lock files Excel leaves next to opened workbooks
+    return sorted(path for path in glob.glob(source, recursive=True)
+                  if not os.path.basename(path).startswith('~$'))
+
+
+# Ingestion and classification of one report, errors are returned instead of raised
+# With profile=True the stage records (see profiling.py) are returned as well, otherwise None
+def process_report(path, subcategory="Sand", fremdbestandteile_under_10=True, profile=False):
+    start = time.perf_counter()
+    status = {'Datei': path, 'Status': 'ok', 'Proben': 0, 'Fehler': ''}
+    result = None
+    profiler = new_profiler(trace_memory=True) if profile else None
+    try:
+        dataframes = read_report(path, profiler=profiler)
+        final_dfs = classify_report(dataframes, worker_reference(), subcategory=subcategory,
+                                    fremdbestandteile_under_10=fremdbestandteile_under_10, profiler=profiler)
+        for idx, final_df in enumerate(final_dfs):
+            final_df.insert(0, 'Probe', idx + 1)
+            final_df.insert(0, 'Datei', os.path.basename(path))
+        result = pd.concat(final_dfs, ignore_index=True)
+        status['Proben'] = len(final_dfs)
+    except Exception as e:
+        status['Status'] = 'error'
+        status['Fehler'] = f"{type(e).__name__}: {e}"
+    status['Dauer_s'] = round(time.perf_counter() - start, 3)
+    return status, result, profiler['records'] if profiler is not None else None
+
+
+# The results are written to output while the reports finish, in the order of the input files;
+# only reports finishing ahead of an earlier, still running one are held back in memory
+# history: path of a results store (see history.py) the classified reports are appended to
+def run_batch(paths, output, subcategory="Sand", fremdbestandteile_under_10=True, max_workers=None, profile=False,
+              history=None):
+    kind = 'parquet' if output.endswith('.parquet') else 'csv'
+    if history is not None:
+        history = open_history(history)
+        reference_version = load_reference()['version']
+    writer = open_table_writer(output, kind, export_schema([('Datei', pa.string())]))
+    statuses, profiles = [None] * len(paths), [None] * len(paths)
+    pending, next_idx, n_done = {}, 0, 0
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as executor:
+            futures = {executor.submit(process_report, path, subcategory, fremdbestandteile_under_10, profile): idx
+                       for idx, path in enumerate(paths)}
+            for future in as_completed(futures):
+                idx = futures[future]
+                status, result, records = future.result()
+                statuses[idx], profiles[idx] = status, {'Datei': paths[idx], 'records': records}
+                pending[idx] = result
+                n_done += 1
+                print(f"[{n_done}/{len(paths)}] {status['Status']:<5} {status['Datei']} {status['Fehler']}")
+
+                while next_idx in pending:
+                    result = pending.pop(next_idx)
+                    if result is not None:
+                        write_table_frame(writer, result)
+                        if history is not None:
+                            with open(paths[next_idx], 'rb') as file:
+                                report_hash = file_hash(file.read())
+                            record_report(history, result, report_hash, subcategory, fremdbestandteile_under_10,
+                                          reference_version, file_name=os.path.basename(paths[next_idx]))
+                    next_idx += 1
+    finally:
+        close_table_writer(writer)
+        if history is not None:
+            close_history(history)
+    return pd.DataFrame(statuses), profiles if profile else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BMF Klassifizierung für viele Agrolab Berichte")
+    parser.add_argument('source', help="Verzeichnis oder Glob Muster der .xlsx Berichte")
+    parser.add_argument('-o', '--output', default='ergebnis.csv',
+                        help="Ergebnisdatei (.csv oder .parquet mit typisierten, kategorialen Spalten)")
+    parser.add_argument('--subcategory', default='Sand', choices=subcategory_options)
+    parser.add_argument('--fremdbestandteile', default='yes', choices=['yes', 'no'],
+                        help="Sind Fremdbestandteile unter 10%%?")
+    parser.add_argument('--workers', type=int, default=None, help="Anzahl Prozesse (Standard: CPU Anzahl)")
+    parser.add_argument('--profile', default=None, help="Laufzeit, Zeilen und Speicher pro Stufe als JSON speichern")
+    parser.add_argument('--history', default=None, help="Ergebnisse zusätzlich an diesen Verlauf (SQLite) anhängen")
+    args = parser.parse_args()
+
+    paths = find_reports(args.source)
+    if not paths:
+        parser.error(f"Keine Berichte gefunden: {args.source}")
+
+    start = time.perf_counter()
+    status_df, profiles = run_batch(paths, args.output, subcategory=args.subcategory,
+                                    fremdbestandteile_under_10=args.fremdbestandteile == 'yes',
+                                    max_workers=args.workers, profile=args.profile is not None, history=args.history)
+    elapsed = time.perf_counter() - start
+
+    status_path = os.path.splitext(args.output)[0] + '_status.csv'
+    status_df.to_csv(status_path, index=False)
+    if profiles is not None:
+        with open(args.profile, 'w', encoding='utf-8') as file:
+            json.dump({'trace_memory': True, 'reports': profiles}, file, ensure_ascii=False, indent=2)
+        print(f"Profil: {args.profile}")
+
+    n_errors = (status_df['Status'] == 'error').sum()
+    print(f"{len(paths)} Berichte in {elapsed:.2f} s ({len(paths) / elapsed:.1f} files/sec), {n_errors} fehlerhaft")
+    print(f"Ergebnis: {args.output}, Status: {status_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Memory use and per-stage time of the pipeline with categorical columns against
+# the same stages on object (string) columns, on a large batched table
+# (both give the same classes, see tests/test_pipeline.py)
+# Usage: python -m benchmarks.bench_categorical [n_samples]
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from classification import sample_context, classify_bmf, bmf_class_dtype
+from ingestion import read_report
+from reference import load_reference, get_compiled_table, get_smallest_bmf
+from pipeline import initial_state, eluat_klausel, f_klausel, erste_relevanzprüfung, check_combinations
+from benchmarks.synthetic import write_report
+
+
+def as_object(df):
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+def run_stages(df, reference, categorical):
+    timings = {}
+
+    def stage(name, func):
+        start = time.perf_counter()
+        result = func()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    context = stage('sample_context', lambda: sample_context(df, subcategory='Sand'))
+    df = stage('classify_bmf', lambda: classify_bmf(df, get_compiled_table(reference), context))
+    df['BMF_sekundär'] = df['BMF_primär']
+    df['Relevante_Klassen'] = pd.Categorical([''] * len(df), dtype=bmf_class_dtype)
+    if not categorical:
+        df = as_object(df)
+
+    state = initial_state()
+    df, state = stage('eluat_klausel', lambda: eluat_klausel(df, context, state))
+    df, state = stage('f_klausel', lambda: f_klausel(df, context, state))
+    df = stage('erste_relevanzprüfung', lambda: erste_relevanzprüfung(df, context, state, get_smallest_bmf(reference)))
+    stage('check_combinations', lambda: check_combinations(df, get_smallest_bmf(reference)))
+    return df, timings
+
+
+def main():
+    n_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    reference = load_reference()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_report(os.path.join(tmp, 'report.xlsx'), 'multi', 20, seed=3)
+        samples = read_report(path)
+
+    # Batched input: many sample tables stacked into one table
+    batch = pd.concat([samples[i % len(samples)] for i in range(n_samples)], ignore_index=True)
+    batch_object = as_object(batch)
+
+    result_cat, timings_cat = run_stages(batch, reference, categorical=True)
+    result_obj, timings_obj = run_stages(batch_object, reference, categorical=False)
+
+    print(f"{len(batch)} rows ({n_samples} samples)")
+    print(f"{'':<24}{'object':>12}{'categorical':>14}")
+    print(f"{'memory [MB]':<24}{result_obj.memory_usage(deep=True).sum() / 1e6:>12.1f}"
+          f"{result_cat.memory_usage(deep=True).sum() / 1e6:>14.1f}")
+    for name in timings_cat:
+        print(f"{name + ' [s]':<24}{timings_obj[name]:>12.3f}{timings_cat[name]:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Microbenchmark of the compiled classify_bmf engine against the original row-wise df.apply implementation
+# (the rows are compared in tests/test_classification.py)
+# Usage: python -m benchmarks.bench_classification [n_rows]
+import sys
+import time
+
+import numpy as np
+
+from classification import compile_classification_table, sample_context, classify_bmf
+from reference import load_pickles
+from benchmarks.legacy import legacy_apply_classify_bmf
+from benchmarks.synthetic import threshold_edge_rows, edge_table
+from benchmarks.timing import timed
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    classification_table, _ = load_pickles()
+
+    start = time.perf_counter()
+    compiled_table = compile_classification_table(classification_table)
+    print(f"Compiling classification_table: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    rng = np.random.default_rng(0)
+    pool = threshold_edge_rows(classification_table)
+    picks = rng.integers(0, len(pool), n_rows)
+    df_large = edge_table([pool[i] for i in picks], toc=0.8)
+
+    # The original implementation is quadratic in the table length, time it on a slice
+    n_legacy = 2_000
+    legacy_time, _ = timed(lambda: legacy_apply_classify_bmf(df_large.iloc[:n_legacy], classification_table, subcategory='Sand'))
+    df_small = df_large.iloc[:n_legacy]
+    small_time, _ = timed(lambda: classify_bmf(df_small, compiled_table, sample_context(df_small, 'Sand')))
+    large_time, _ = timed(lambda: classify_bmf(df_large, compiled_table, sample_context(df_large, 'Sand')))
+
+    print(f"{n_legacy} rows   original: {legacy_time:.3f} s   compiled: {small_time:.4f} s"
+          f"   ({legacy_time / small_time:.0f}x)")
+    print(f"{len(df_large)} rows compiled: {large_time:.4f} s ({len(df_large) / large_time:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# Vectorized parse_menge against the original element-wise clean_menge apply
+# (same values, see tests/test_ingestion.py)
+# Usage: python -m benchmarks.bench_clean_menge [n_values]
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ingestion import parse_menge
+from benchmarks.legacy import clean_menge
+from benchmarks.timing import timed
+
+# Typical cells of the Menge column
+cells = ['<0,5', '<= 3,2', '≥10', ' > 7 ', '12,75', '0,034', 'n.n.', '', None, np.nan, 5, 7.5, '=4', '>=1,5', '≤ 0,01']
+
+
+def compare(name, column):
+    legacy_time, _ = timed(lambda: column.apply(clean_menge))
+    vectorized_time, (_, qualifier) = timed(lambda: parse_menge(column))
+
+    print(f"{name}: {len(column)} values, qualifiers: {qualifier.value_counts().to_dict()}")
+    print(f"  apply(clean_menge): {legacy_time:.3f} s   parse_menge: {vectorized_time:.3f} s"
+          f"   ({legacy_time / vectorized_time:.1f}x)")
+
+
+def main():
+    n_values = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+
+    # Realistic column with repeating cells
+    compare("typical cells", pd.Series([cells[i] for i in rng.integers(0, len(cells), n_values)], dtype=object))
+
+    # Worst case: (almost) every cell is distinct
+    prefixes = np.array(['', '<', '>', '<=', '≥'], dtype=object)
+    numbers = pd.Series(rng.uniform(0, 1000, n_values).round(4)).astype(str).str.replace('.', ',', regex=False)
+    compare("distinct cells", pd.Series(prefixes[rng.integers(0, len(prefixes), n_values)] + numbers.to_numpy(dtype=object)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# Columnar classification of all samples in one long table against the per-sample loop
+# (same results, see tests/test_golden.py)
+# Usage: python -m benchmarks.bench_columnar
+import os
+import tempfile
+
+from ingestion import read_report
+from pipeline import classify_report
+from reference import load_reference
+from benchmarks.synthetic import write_report
+from benchmarks.timing import best_of
+
+
+def main():
+    reference = load_reference()
+    print(f"{'samples':>7} {'per sample [s]':>15} {'columnar [s]':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_samples in [1, 5, 10, 30, 100]:
+            path = write_report(os.path.join(tmp, f'report_{n_samples}.xlsx'), 'multi', n_samples, seed=n_samples)
+            dataframes = read_report(path)
+
+            loop_time, _ = best_of(lambda: classify_report(dataframes, reference, columnar=False))
+            columnar_time, _ = best_of(lambda: classify_report(dataframes, reference, columnar=True))
+            print(f"{n_samples:>7} {loop_time:>15.4f} {columnar_time:>13.4f} {loop_time / columnar_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
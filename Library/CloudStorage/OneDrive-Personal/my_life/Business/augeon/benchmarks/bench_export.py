@@ -0,0 +1,67 @@
+# Export formats: time and peak memory of the streaming writers fed by iter_classify_report
+# against concatenating all samples first (the written files are checked in tests/test_export.py).
+# The streaming peak includes the chunk iter_classify_report classifies at once (up to 32 samples);
+# the writer columns show the writers alone: flat for CSV, growing per sample for Parquet and Excel
+# Usage: python -m benchmarks.bench_export
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from export import write_tables, with_probe, write_excel
+from ingestion import read_report
+from pipeline import classify_report, iter_classify_report
+from reference import load_reference
+from benchmarks.synthetic import write_report
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024 / 1024
+
+
+def streamed(dataframes, reference):
+    return (final_df for _, final_df in iter_classify_report(dataframes, reference))
+
+
+def main():
+    reference = load_reference()
+    with tempfile.TemporaryDirectory() as tmp:
+        # writer: the results are classified beforehand, only the memory of the writer itself is measured
+        print(f"{'samples':>7} {'format':<8} {'concat [s]':>11} {'concat [MiB]':>13} {'streaming [s]':>14} {'streaming [MiB]':>16}"
+              f" {'writer [MiB]':>13} {'writer [KiB/sample]':>20}")
+        for n_samples in [10, 100, 400]:
+            path = write_report(os.path.join(tmp, f'report_{n_samples}.xlsx'), 'multi', n_samples, seed=n_samples)
+            dataframes = read_report(path)
+            final_dfs = classify_report(dataframes, reference)
+            out = os.path.join(tmp, 'out')
+
+            cases = {
+                'csv': (lambda: pd.concat(classify_report(dataframes, reference), ignore_index=True).to_csv(out + '.csv', index=False),
+                        lambda: write_tables(streamed(dataframes, reference), out + '.csv', 'csv'),
+                        lambda: write_tables(iter(final_dfs), out + '.csv', 'csv')),
+                'parquet': (lambda: pd.concat(list(with_probe(classify_report(dataframes, reference))), ignore_index=True)
+                            .to_parquet(out + '.parquet', index=False),
+                            lambda: write_tables(with_probe(streamed(dataframes, reference)), out + '.parquet', 'parquet'),
+                            lambda: write_tables(with_probe(final_dfs), out + '.parquet', 'parquet')),
+                'excel': (None,
+                          lambda: write_excel(streamed(dataframes, reference), out + '.xlsx'),
+                          lambda: write_excel(iter(final_dfs), out + '.xlsx')),
+            }
+            for kind, (concat_func, stream_func, writer_func) in cases.items():
+                concat = measure(concat_func) if concat_func else (float('nan'), float('nan'))
+                stream = measure(stream_func)
+                writer = measure(writer_func)
+                print(f"{n_samples:>7} {kind:<8} {concat[0]:>11.3f} {concat[1]:>13.1f} {stream[0]:>14.3f} {stream[1]:>16.1f}"
+                      f" {writer[1]:>13.1f} {writer[1] * 1024 / n_samples:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
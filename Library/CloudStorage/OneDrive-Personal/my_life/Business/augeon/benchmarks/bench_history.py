@@ -0,0 +1,58 @@
+# Results history: append time, and indexed queries over a few hundred thousand stored rows
+# (the stored classes and the query filters are checked in tests/test_history.py)
+# Usage: python -m benchmarks.bench_history [n_reports]
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from export import with_probe
+from history import open_history, record_report, query_history, history_counts, close_history
+from ingestion import read_report
+from pipeline import classify_report
+from reference import load_reference
+from benchmarks.synthetic import write_report
+from benchmarks.timing import best_of
+
+
+def main():
+    n_reports = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    reference = load_reference()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_report(os.path.join(tmp, 'report.xlsx'), 'multi', 50, seed=1, distribution='thresholds')
+        results = pd.concat(with_probe(classify_report(read_report(path), reference)), ignore_index=True)
+
+        # The same report under different hashes, spread over two years
+        history = open_history(os.path.join(tmp, 'history.sqlite'))
+        dates = pd.date_range('2024-10-01', periods=n_reports, freq=pd.Timedelta(days=730) / n_reports)
+        start = time.perf_counter()
+        for idx, classified_at in enumerate(dates):
+            record_report(history, results, f"hash-{idx}", 'Sand', True, reference['version'],
+                          file_name=f"bericht_{idx}.xlsx", classified_at=classified_at)
+        append_time = time.perf_counter() - start
+        counts = history_counts(history)
+        print(f"{counts['rows']:,} rows from {counts['reports']} reports appended in {append_time:.2f} s "
+              f"({counts['rows'] / append_time:,.0f} rows/s)")
+
+        stoff = results['Stoff'].astype(str).iloc[0]
+        queries = {
+            f"{stoff} worse than BM-F1, last year": dict(stoff=stoff, above_class='BM-F1 BG-F1',
+                                                         since='2025-10-01', until='2026-10-01'),
+            f"{stoff} BMF_primär worse than BM-0*": dict(stoff=stoff, above_class='BM-0* BG-0*', column='BMF_primär'),
+            "all Stoffe worse than BM-F2": dict(above_class='BM-F2 BG-F2'),
+            "one month": dict(since='2025-03-01', until='2025-04-01'),
+        }
+        print(f"{'query':<55} {'rows':>8} {'time [ms]':>10}")
+        for name, filters in queries.items():
+            seconds, found = best_of(lambda: query_history(history, **filters), repeat=5)
+            print(f"{name:<55} {len(found):>8,} {seconds * 1000:>10.2f}")
+
+        seconds, found = best_of(lambda: query_history(history, report_hash='hash-7'), repeat=5)
+        print(f"{'one report by hash':<55} {len(found):>8,} {seconds * 1000:>10.2f}")
+        close_history(history)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+# Parse time of the single pass reader against the original pd.read_excel sequence
+# (both return the same tables, see tests/test_ingestion.py)
+# Usage: python -m benchmarks.bench_ingestion
+import os
+import tempfile
+
+from ingestion import read_report
+from benchmarks.legacy import legacy_read_report
+from benchmarks.synthetic import write_report, write_stale_dimension
+from benchmarks.timing import best_of
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [('row7', 1), ('row10', 1), ('mantelv', 1), ('multi', 1), ('multi', 10), ('multi', 20)]
+        print(f"{'layout':<8} {'samples':>7} {'legacy [s]':>11} {'single pass [s]':>16} {'speedup':>8}")
+        for layout, n_samples in cases:
+            path = write_report(os.path.join(tmp, f"{layout}_{n_samples}.xlsx"), layout, n_samples)
+            legacy_time, _ = best_of(lambda: legacy_read_report(path))
+            new_time, _ = best_of(lambda: read_report(path))
+
+            print(f"{layout:<8} {n_samples:>7} {legacy_time:>11.3f} {new_time:>16.3f} {legacy_time / new_time:>7.1f}x")
+
+        # Stale <dimension ref="A1"/>: the sheet is still read completely, only the size hint is missing
+        path = write_report(os.path.join(tmp, 'multi_10.xlsx'), 'multi', 10)
+        stale_path = write_stale_dimension(path, os.path.join(tmp, 'multi_10_stale.xlsx'))
+        stale_time, _ = best_of(lambda: read_report(stale_path))
+        print(f"{'stale':<8} {10:>7} {'':>11} {stale_time:>16.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# Per-sample pipeline: sequential loop against the thread pool and the columnar path,
+# on samples that set both triggers alternating with clean ones
+# (identical results and no trigger leaks are checked in tests/test_pipeline.py)
+# Usage: python -m benchmarks.bench_pipeline [n_samples]
+import sys
+import tempfile
+
+from pipeline import classify_report
+from reference import load_reference
+from benchmarks.synthetic import trigger_and_clean_samples
+from benchmarks.timing import best_of
+
+
+def main():
+    n_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    reference = load_reference()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataframes = trigger_and_clean_samples(tmp, n_samples)
+
+    sequential_time, _ = best_of(lambda: classify_report(dataframes, reference, subcategory='Sand', columnar=False))
+    threaded_time, _ = best_of(lambda: classify_report(dataframes, reference, subcategory='Sand', max_workers=4))
+    columnar_time, _ = best_of(lambda: classify_report(dataframes, reference, subcategory='Sand'))
+
+    print(f"{n_samples} samples (triggering and clean alternating)")
+    print(f"sequential: {sequential_time:.3f} s   thread pool (4): {threaded_time:.3f} s   columnar: {columnar_time:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
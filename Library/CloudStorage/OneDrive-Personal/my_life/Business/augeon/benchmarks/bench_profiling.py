@@ -0,0 +1,34 @@
+# Overhead of the stage profiler: switched off, timings only and timings with peak memory
+# Usage: python -m benchmarks.bench_profiling
+import os
+import tempfile
+
+from ingestion import read_report
+from pipeline import classify_report
+from profiling import new_profiler, profile_summary
+from reference import load_reference
+from benchmarks.synthetic import write_report
+from benchmarks.timing import best_of
+
+
+def main():
+    reference = load_reference()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_report(os.path.join(tmp, 'report.xlsx'), 'multi', 30, seed=1)
+        dataframes = read_report(path)
+
+        for columnar in [True, False]:
+            off, _ = best_of(lambda: classify_report(dataframes, reference, columnar=columnar), repeat=5)
+            timings, _ = best_of(lambda: classify_report(dataframes, reference, columnar=columnar, profiler=new_profiler()), repeat=5)
+            memory, _ = best_of(lambda: classify_report(dataframes, reference, columnar=columnar,
+                                                        profiler=new_profiler(trace_memory=True)), repeat=5)
+            print(f"columnar={columnar!s:<5}  off: {off:.4f} s   timings: {timings:.4f} s ({timings / off - 1:+.1%})   "
+                  f"memory: {memory:.4f} s ({memory / off - 1:+.1%})")
+
+        profiler = new_profiler(trace_memory=True)
+        classify_report(read_report(path, profiler=profiler), reference, columnar=False, profiler=profiler)
+        print(profile_summary(profiler).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+# Startup time of the reference tables: pickles + compile against the memory-mapped artifact,
+# and the lazily built lookup structures (both give the same structures, see tests/test_reference.py)
+# Usage: python -m benchmarks.bench_reference
+import os
+import tempfile
+
+from reference import SCHEMA_VERSION, build_artifact, load_artifact, reference_from_pickles, source_hash
+from reference import get_compiled_table
+from benchmarks.timing import best_of
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_artifact(path=os.path.join(tmp, 'reference_tables.arrow'))
+        expected_hash = source_hash()
+
+        pickle_time, _ = best_of(reference_from_pickles, repeat=20)
+        artifact_time, from_artifact = best_of(lambda: load_artifact(path, expected_source_hash=expected_hash), repeat=20)
+
+        # The lookup structures are only built on first use
+        pickle_build_time, _ = best_of(lambda: get_compiled_table(reference_from_pickles()), repeat=20)
+        artifact_build_time, _ = best_of(lambda: get_compiled_table(load_artifact(path, expected_source_hash=expected_hash)),
+                                         repeat=20)
+
+        print(f"Schema version {SCHEMA_VERSION}, reference version {from_artifact['version']}, "
+              f"artifact size {os.path.getsize(path) / 1024:.1f} KiB")
+        print(f"load + validate   pickles: {pickle_time * 1000:.2f} ms   artifact: {artifact_time * 1000:.2f} ms")
+        print(f"load + first use  pickles: {pickle_build_time * 1000:.2f} ms   artifact: {artifact_build_time * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+# Cold and warm runs through the on-disk result cache (hits, misses and eviction are checked
+# in tests/test_result_cache.py)
+# Usage: python -m benchmarks.bench_result_cache
+import os
+import tempfile
+
+from reference import load_reference
+from result_cache import open_cache, cached_classify_report, format_stats
+from benchmarks.synthetic import write_report
+from benchmarks.timing import timed
+
+
+def main():
+    reference = load_reference()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_report(os.path.join(tmp, 'report.xlsx'), 'multi', 30, seed=1)
+        with open(path, 'rb') as file:
+            file_bytes = file.read()
+        cache = open_cache(os.path.join(tmp, 'cache'))
+
+        cold_time, _ = timed(lambda: cached_classify_report(cache, file_bytes, reference, 'Ton', False))
+        warm_time, _ = timed(lambda: cached_classify_report(cache, file_bytes, reference, 'Ton', False))
+        # Other parameters: the parsed tables come from the cache, only the classification runs
+        other_time, _ = timed(lambda: cached_classify_report(cache, file_bytes, reference, 'Sand', True))
+
+        print(f"30 samples   cold: {cold_time:.3f} s   warm: {warm_time:.4f} s ({cold_time / warm_time:.0f}x)   "
+              f"new parameters: {other_time:.3f} s")
+        print(format_stats(cache))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# Time to the first classified sample with iter_classify_report against waiting for classify_report
+# (same results, see tests/test_pipeline.py)
+# Usage: python -m benchmarks.bench_streaming
+import os
+import tempfile
+import time
+
+from ingestion import read_report
+from pipeline import classify_report, iter_classify_report
+from reference import load_reference
+from benchmarks.synthetic import write_report
+
+
+def main():
+    reference = load_reference()
+    print(f"{'samples':>7} {'classify_report [s]':>20} {'first sample [s]':>17} {'all samples [s]':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_samples in [10, 50, 200]:
+            path = write_report(os.path.join(tmp, f'report_{n_samples}.xlsx'), 'multi', n_samples, seed=n_samples,
+                                distribution='thresholds')
+            dataframes = read_report(path)
+
+            start = time.perf_counter()
+            classify_report(dataframes, reference, subcategory='Ton')
+            batch_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            first_time = None
+            for _ in iter_classify_report(dataframes, reference, subcategory='Ton'):
+                if first_time is None:
+                    first_time = time.perf_counter() - start
+            stream_time = time.perf_counter() - start
+            print(f"{n_samples:>7} {batch_time:>20.4f} {first_time:>17.4f} {stream_time:>16.4f}")
+
+
+if __name__ == '__main__':
+    main()
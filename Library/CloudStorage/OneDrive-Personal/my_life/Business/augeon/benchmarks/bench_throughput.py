@@ -0,0 +1,34 @@
+# End-to-end throughput (read_report + classify_report) per layout, sample count and value distribution
+# Usage: python -m benchmarks.bench_throughput
+import os
+import tempfile
+
+from ingestion import read_report
+from pipeline import classify_report
+from reference import load_reference
+from benchmarks.synthetic import write_report, threshold_values
+from benchmarks.timing import best_of
+
+
+def main():
+    reference = load_reference()
+    thresholds = threshold_values()
+    cases = [('row7', 1), ('row10', 1), ('mantelv', 1), ('multi', 1), ('multi', 10), ('multi', 50)]
+
+    print(f"{'layout':<8} {'samples':>7} {'distribution':<11} {'ingestion [s]':>14} {'classification [s]':>19} "
+          f"{'files/s':>8} {'rows/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout, n_samples in cases:
+            for distribution in ['uniform', 'thresholds']:
+                path = write_report(os.path.join(tmp, f"{layout}_{n_samples}_{distribution}.xlsx"), layout, n_samples,
+                                    seed=n_samples, distribution=distribution, thresholds=thresholds)
+                read_time, dataframes = best_of(lambda: read_report(path))
+                classify_time, final_dfs = best_of(lambda: classify_report(dataframes, reference))
+                total = read_time + classify_time
+                n_rows = sum(len(df) for df in final_dfs)
+                print(f"{layout:<8} {n_samples:>7} {distribution:<11} {read_time:>14.4f} {classify_time:>19.4f} "
+                      f"{1 / total:>8.1f} {n_rows / total:>10,.0f}")
+
+
+if __name__ == '__main__':
+    main()
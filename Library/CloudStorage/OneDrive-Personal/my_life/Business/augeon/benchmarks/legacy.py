@@ -0,0 +1,184 @@
+# Frozen copies of the original app.py code paths.
+# Only used by the benchmarks and tests as baseline and reference for the new implementations.
+import pandas as pd
+
+from classification import sample_context, classify_bmf, bmf_class_dtype
+from ingestion import filter_values
+from pipeline import eluat_klausel, f_klausel, erste_relevanzprüfung
+from reference import get_compiled_table, get_smallest_bmf
+
+
+# Clean and convert the 'Menge' column to numeric
+def clean_menge(value):
+    if isinstance(value, str):
+        value = value.replace('<', '') \
+                        .replace('>', '') \
+                        .replace('<=', '') \
+                        .replace('≥', '') \
+                        .replace('>=', '') \
+                        .replace('≤', '') \
+                        .replace('=', '') \
+                        .replace(',', '.') \
+                        .strip()
+    return pd.to_numeric(value, errors='coerce')
+
+
+def legacy_read_report(uploaded_file):
+    # Step 1: Read the first 6 rows to check if column F exists and if F6 has data
+    try:
+        temp_df = pd.read_excel(uploaded_file, header=None, nrows=6)
+
+        # Check if column F exists in the dataframe
+        if temp_df.shape[1] > 5:  # Check if there are more than 5 columns (i.e., column F exists)
+            f6_value = temp_df.iloc[5, 5]  # Access cell F6 (row 6, column 6)
+            if pd.isna(f6_value):
+                f6_exists = False  # F6 exists but is empty
+            else:
+                f6_exists = True  # F6 exists and is not empty
+        else:
+            f6_exists = False  # F6 does not exist (out of bounds)
+
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        f6_exists = False  # If any error occurs, assume F6 is empty or non-existent
+
+    # Step 2: Based on whether F6 exists and is not empty, proceed accordingly
+    if not f6_exists:  # Cell F6 is empty or out of bounds
+        # Read the first 15 rows without header to check cell values
+        temp_df = pd.read_excel(uploaded_file, header=None, nrows=15)
+
+        # Determine the header row based on cell values
+        if temp_df.iloc[9, 0] == "Parameter":
+            header_row = 10
+        elif temp_df.iloc[6, 0] == "Parameter":
+            header_row = 7
+        elif temp_df.iloc[13, 0] == "PARAMETER MIT BEWERTUNG NACH MANTELV":
+            header_row = 15
+        else:
+            raise ValueError("Unknown Excel format")
+
+        # Read the data with the correct header
+        df = pd.read_excel(uploaded_file, header=header_row, usecols=[0, 1, 4])
+
+        # Rename columns based on column indexes
+        df.columns = ['Stoff', 'Aggregat', 'Menge']
+
+        # Proceed with filtering and cleaning as before
+        df = df[df["Stoff"].isin(filter_values)]
+        df['Menge'] = df['Menge'].apply(clean_menge)
+
+        # Update 'Aggregat' for 'pH-Wert'
+        df.loc[df['Stoff'] == 'pH-Wert', 'Aggregat'] = '-'
+
+        # Delete the row where 'Stoff' is 'Benzo(a)pyren' and 'Aggregat' is 'µg/l'
+        df = df[~((df['Stoff'] == 'Benzo(a)pyren') & (df['Aggregat'] == 'µg/l'))]
+        df = df.reset_index(drop=True)
+        dataframes = [df]  # Wrap the single dataframe into a list
+
+    else:  # Cell F6 is NOT empty
+        # Check how many columns starting from column E are not empty
+        temp_df = pd.read_excel(uploaded_file, header=None, nrows=6)
+        non_empty_columns = temp_df.iloc[5, 4:].notna().sum()
+
+        dataframes = []
+        for i in range(non_empty_columns):
+            df = pd.read_excel(uploaded_file, header=10, usecols=[0, 1, 4 + i])
+            df.columns = ['Stoff', 'Aggregat', 'Menge']
+            df = df[df["Stoff"].isin(filter_values)]
+            df['Menge'] = df['Menge'].apply(clean_menge)
+            df.loc[df['Stoff'] == 'pH-Wert', 'Aggregat'] = '-'
+            df = df[~((df['Stoff'] == 'Benzo(a)pyren') & (df['Aggregat'] == 'µg/l'))]
+            df = df.reset_index(drop=True)
+            dataframes.append(df)
+
+    return dataframes
+
+
+def legacy_classify_bmf(row, df, classification_table, subcategory=None):
+    stoff = row['Stoff']
+    aggregat = row['Aggregat']
+    menge = row['Menge']
+
+    # Map 'Stoff' to 'Aggregat' if needed
+    if stoff in ['Sulfat', 'Sulfat (SO4)']:
+        aggregat = 'mg/l'
+
+    # Determine 'toc_indicator' within the function
+    # Initialize 'toc_indicator'
+    toc_indicator = None
+
+    # Check if 'Kohlenstoff(C) organisch (TOC)' exists in the dataframe
+    if 'Kohlenstoff(C) organisch (TOC)' in df['Stoff'].values:
+        # Get the 'Menge' value for 'Kohlenstoff(C) organisch (TOC)'
+        toc_menge = df.loc[df['Stoff'] == 'Kohlenstoff(C) organisch (TOC)', 'Menge'].iloc[0]
+        # Determine the 'toc_indicator' value
+        if toc_menge > 0.5:
+            toc_indicator = 'TOC'
+        else:
+            toc_indicator = 'no_TOC'
+    else:
+        # Default value if 'Kohlenstoff(C) organisch (TOC)' is not found
+        toc_indicator = 'no_TOC'
+
+    # Classification logic
+    if stoff in classification_table and aggregat in classification_table[stoff]:
+        stoff_agg = classification_table[stoff][aggregat]
+
+        # Check if subcategory is needed
+        if isinstance(stoff_agg, dict) and 'thresholds' not in stoff_agg:
+            # Subcategory is needed
+            if subcategory in stoff_agg:
+                stoff_data = stoff_agg[subcategory]
+            elif toc_indicator in stoff_agg:
+                # Use 'toc_indicator' as subcategory
+                stoff_data = stoff_agg[toc_indicator]
+            else:
+                # Proceed as if there was no subcategory
+                row['BMF_primär'] = "Not Classified"
+                return row
+        else:
+            stoff_data = stoff_agg
+
+        thresholds = stoff_data['thresholds']
+        classifications = stoff_data['classifications']
+
+        # Find the smallest threshold larger than 'menge'
+        valid_thresholds = [threshold for threshold in thresholds if threshold > menge]
+
+        if valid_thresholds:
+            # Get the smallest threshold larger than 'menge'
+            min_threshold = min(valid_thresholds)
+
+            # Find the leftmost occurrence of this smallest threshold
+            for idx, threshold in enumerate(thresholds):
+                if threshold == min_threshold:
+                    row['BMF_primär'] = classifications[idx]
+                    break
+
+        else:
+            # Handle cases where no valid threshold is found
+            # Check if "Stoff" is "Benzo(a)pyren" or "EOX" and "Menge" exceeds the rightmost threshold
+            if stoff in ["Benzo(a)pyren", "EOX"] and menge > thresholds[-1]:
+                row['BMF_primär'] = "> BM-0 BG-0"
+            else:
+                row['BMF_primär'] = ">BM-F3 BG-F3"
+    else:
+        row['BMF_primär'] = "Not Classified"
+
+    return row
+
+
+def legacy_apply_classify_bmf(df, classification_table, subcategory=None):
+    return df.apply(lambda row: legacy_classify_bmf(row, df, classification_table, subcategory=subcategory), axis=1)
+
+
+# What the old module level triggers gave: a sample classified after one that set both triggers
+def classify_after_trigger(df, reference, subcategory='Sand'):
+    context = sample_context(df, subcategory=subcategory)
+    df = classify_bmf(df, get_compiled_table(reference), context)
+    df['BMF_sekundär'] = df['BMF_primär']
+    df['Relevante_Klassen'] = pd.Categorical([''] * len(df), dtype=bmf_class_dtype)
+    state = {'f_trigger': True, 'd_trigger': True}
+    df, state = eluat_klausel(df, context, state)
+    df, state = f_klausel(df, context, state)
+    return erste_relevanzprüfung(df, context, state, get_smallest_bmf(reference))
@@ -0,0 +1,109 @@
+# Load test of the HTTP service (service.py): concurrent POST /classify requests, p50/p90/p99 latency
+# Usage:
+#   python -m benchmarks.load_test                                   (starts a local instance itself)
+#   python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 16 --requests 500 --file report.xlsx
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.synthetic import write_report
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+xlsx_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=2) as response:
+                return json.loads(response.read())
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Service at {url} did not become healthy within {timeout} s")
+
+
+def post(url, body, content_type):
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type}, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return time.perf_counter() - start, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the BMF classification service")
+    parser.add_argument('--url', default=None, help="Running service, otherwise a local instance is started")
+    parser.add_argument('--file', default=None, help=".xlsx report to send (default: synthetic report)")
+    parser.add_argument('--samples', type=int, default=5, help="Samples of the synthetic report")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes of the started instance")
+    parser.add_argument('--subcategory', default='Sand')
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file or write_report(os.path.join(tmp, 'report.xlsx'), 'multi', args.samples, seed=1,
+                                         distribution='thresholds')
+        with open(path, 'rb') as file:
+            body = file.read()
+
+        url = args.url
+        if url is None:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            env = dict(os.environ, **({'BMF_SERVICE_WORKERS': str(args.workers)} if args.workers else {}))
+            server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'service:app', '--port', str(port),
+                                      '--log-level', 'warning'], cwd=APP_DIR, env=env,
+                                     stdout=subprocess.DEVNULL)
+        try:
+            health = wait_until_healthy(url)
+            classify_url = f"{url}/classify?subcategory={urllib.request.quote(args.subcategory)}&fremdbestandteile=yes"
+
+            # Warm up every worker process before measuring
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(lambda _: post(classify_url, body, xlsx_type), range(args.concurrency * 2)))
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                results = list(executor.map(lambda _: post(classify_url, body, xlsx_type), range(args.requests)))
+            elapsed = time.perf_counter() - start
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(status != 200 for _, status in results)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    print(f"Reference version {health['reference_version']}, {os.path.basename(path)}: {len(body) / 1024:.0f} KiB")
+    print(f"{args.requests} requests, concurrency {args.concurrency}: {args.requests / elapsed:.1f} requests/s, {errors} errors")
+    print(f"latency [ms]  p50: {p50:.1f}   p90: {p90:.1f}   p99: {p99:.1f}   max: {latencies.max():.1f}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
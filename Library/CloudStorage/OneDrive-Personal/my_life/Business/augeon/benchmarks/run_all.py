@@ -0,0 +1,37 @@
+# Runs every benchmark script, fails if one of them fails
+# The correctness checks live in tests/ (python -m pytest)
+# Usage: python -m benchmarks.run_all [name filter]
+import glob
+import os
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+
+def main():
+    name_filter = sys.argv[1] if len(sys.argv) > 1 else ''
+    scripts = sorted(glob.glob(os.path.join(BENCH_DIR, 'bench_*.py')))
+    scripts = [script for script in scripts if name_filter in os.path.basename(script)]
+
+    failed = []
+    for script in scripts:
+        name = os.path.basename(script)
+        module = 'benchmarks.' + os.path.splitext(name)[0]
+        print(f"===== {name}")
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-m', module], cwd=APP_DIR, capture_output=True, text=True)
+        print(completed.stdout.rstrip())
+        if completed.returncode != 0:
+            print(completed.stderr)
+            failed.append(name)
+        print(f"----- {name}: {'FAILED' if completed.returncode else 'ok'} ({time.perf_counter() - start:.1f} s)\n")
+
+    print(f"{len(scripts) - len(failed)}/{len(scripts)} ok" + (f", failed: {', '.join(failed)}" if failed else ''))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
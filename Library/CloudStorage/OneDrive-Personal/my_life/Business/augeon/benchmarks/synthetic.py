@@ -0,0 +1,217 @@
+# Synthetic Agrolab-like reports and classification edge cases for the benchmarks and tests
+import os
+import random
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from ingestion import filter_values, read_report
+from reference import load_pickles
+
+# Units as they appear in the Agrolab reports
+units = {
+    "Kohlenstoff(C) organisch (TOC)": ['%'],
+    "EOX": ['mg/kg'],
+    "Arsen (As)": ['mg/kg', 'µg/l'],
+    "Blei (Pb)": ['mg/kg', 'µg/l'],
+    "Cadmium (Cd)": ['mg/kg', 'µg/l'],
+    "Chrom (Cr)": ['mg/kg', 'µg/l'],
+    "Kupfer (Cu)": ['mg/kg', 'µg/l'],
+    "Nickel (Ni)": ['mg/kg', 'µg/l'],
+    "Quecksilber (Hg)": ['mg/kg', 'µg/l'],
+    "Thallium (Tl)": ['mg/kg', 'µg/l'],
+    "Zink (Zn)": ['mg/kg', 'µg/l'],
+    "Kohlenwasserstoffe C10-C22 (GC)": ['mg/kg'],
+    "Kohlenwasserstoffe C10-C40": ['mg/kg'],
+    "Benzo(a)pyren": ['mg/kg', 'µg/l'],
+    "PAK EPA Summe gem. ErsatzbaustoffV": ['mg/kg'],
+    "PCB 7 Summe gem. ErsatzbaustoffV": ['mg/kg', 'µg/l'],
+    "pH-Wert": [''],
+    "elektrische Leitfähigkeit": ['µS/cm'],
+    "Sulfat (SO4)": ['mg/l'],
+    "Naphthalin/Methylnaph.-Summe gem. ErsatzbaustoffV": ['µg/l'],
+    "PAK 15 Summe gem. ErsatzbaustoffV": ['µg/l'],
+}
+
+
+# Laboratory value as it appears in the sheet: number, text with decimal comma or '<' text
+def format_menge(rng, value):
+    kind = rng.random()
+    if kind < 0.2:
+        return f"<{value}".replace('.', ',')
+    if kind < 0.4:
+        return f"{value}".replace('.', ',')
+    return value
+
+
+def random_menge(rng):
+    return format_menge(rng, round(rng.uniform(0, 200), 2))
+
+
+# Upper bounds like 999999999 only stand for "no limit" in classification_table
+sentinel_threshold = 1e8
+
+
+# Sorted real thresholds per (Stoff, unit in the report) over all subcategories and TOC indicators
+def threshold_values(classification_table=None):
+    if classification_table is None:
+        classification_table, _ = load_pickles()
+
+    values = {}
+    for stoff, aggregate in classification_table.items():
+        for aggregat, stoff_agg in aggregate.items():
+            entries = stoff_agg.values() if 'thresholds' not in stoff_agg else [stoff_agg]
+            thresholds = {float(t) for entry in entries for t in entry['thresholds'] if t < sentinel_threshold}
+            values[(stoff, '' if aggregat == '-' else aggregat)] = sorted(thresholds)
+
+    # The TOC indicator switches at 0.5 %
+    values[("Kohlenstoff(C) organisch (TOC)", '%')].append(0.5)
+    return values
+
+
+# Value next to a threshold: exactly on it, just below or just above, or above the last one
+# (rarely even above the "no limit" sentinels, for the '> BM-0 BG-0' overflow)
+def threshold_menge(rng, thresholds):
+    if not thresholds:
+        return random_menge(rng)
+    kind = rng.random()
+    if kind < 0.02:
+        return 1e12
+    if kind < 0.1:
+        return format_menge(rng, round(max(thresholds) * rng.uniform(1.1, 3), 3))
+    threshold = rng.choice(thresholds) or 0.01
+    if kind < 0.4:
+        value = threshold
+    elif kind < 0.7:
+        value = threshold * rng.uniform(0.5, 0.99)
+    else:
+        value = threshold * rng.uniform(1.01, 1.5)
+    return format_menge(rng, round(value, 3))
+
+
+# Value below the lowest positive threshold, i.e. the lowest class
+def clean_menge(rng, thresholds):
+    positive = [t for t in thresholds if t > 0]
+    if not positive:
+        return random_menge(rng)
+    return format_menge(rng, round(positive[0] * rng.uniform(0.05, 0.9), 3))
+
+
+distributions = ['uniform', 'thresholds', 'clean']
+
+
+# All (Stoff, Aggregat) rows of one report, padded with filler parameters that
+# are not in filter_values (real reports contain a lot of those)
+def report_rows(filler_rows=150):
+    rows = [(stoff, unit) for stoff in filter_values for unit in units[stoff]]
+    rows += [(f"Parameter {i}", 'mg/kg') for i in range(filler_rows)]
+    return rows
+
+
+# layout: 'row7', 'row10', 'mantelv' (single sample) or 'multi' (F6 layout)
+# distribution: 'uniform' (0-200), 'thresholds' (values around the classification_table
+# thresholds, so every class and the eluat/F escalations occur) or 'clean' (lowest class)
+def write_report(path, layout='multi', n_samples=1, filler_rows=150, seed=0, distribution='uniform', thresholds=None):
+    rng = random.Random(seed)
+    if distribution not in distributions:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    if distribution != 'uniform' and thresholds is None:
+        thresholds = threshold_values()
+    wb = Workbook()
+    ws = wb.active
+
+    if layout == 'multi':
+        header_row = 10
+        ws.cell(row=10, column=1, value="Parameter")
+        for i in range(n_samples):
+            ws.cell(row=6, column=5 + i, value=f"Probe {i + 1}")
+    else:
+        n_samples = 1
+        ws.cell(row=1, column=1, value="AGROLAB Prüfbericht")
+        if layout == 'row10':
+            header_row = 10
+            ws.cell(row=10, column=1, value="Parameter")
+        elif layout == 'row7':
+            header_row = 7
+            ws.cell(row=7, column=1, value="Parameter")
+        elif layout == 'mantelv':
+            header_row = 15
+            ws.cell(row=14, column=1, value="PARAMETER MIT BEWERTUNG NACH MANTELV")
+        else:
+            raise ValueError(f"Unknown layout: {layout}")
+
+    # Header line used by pd.read_excel(header=header_row)
+    ws.cell(row=header_row + 1, column=1, value="Parameter")
+    ws.cell(row=header_row + 1, column=2, value="Einheit")
+    for i in range(n_samples):
+        ws.cell(row=header_row + 1, column=5 + i, value=f"Probe {i + 1}")
+
+    for offset, (stoff, unit) in enumerate(report_rows(filler_rows)):
+        excel_row = header_row + 2 + offset
+        ws.cell(row=excel_row, column=1, value=stoff)
+        ws.cell(row=excel_row, column=2, value=unit)
+        for i in range(n_samples):
+            if distribution == 'uniform':
+                menge = random_menge(rng)
+            elif distribution == 'thresholds':
+                menge = threshold_menge(rng, thresholds.get((stoff, unit), []))
+            else:
+                menge = clean_menge(rng, thresholds.get((stoff, unit), []))
+            ws.cell(row=excel_row, column=5 + i, value=menge)
+
+    wb.save(path)
+    return path
+
+
+# Rewrites the <dimension ref> of the first sheet to "A1", as many non-Excel writers leave it
+def write_stale_dimension(path, target):
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as sink:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                data = re.sub(rb'<dimension ref="[^"]*"\s*/>', b'<dimension ref="A1"/>', data)
+            sink.writestr(item, data)
+    return target
+
+
+# Classification edge cases: every Stoff/Aggregat combination at, just below and just above each threshold,
+# plus NaN, negative and huge values and combinations which are not classified
+def threshold_edge_rows(classification_table):
+    rows = []
+    for stoff, aggregate in classification_table.items():
+        for aggregat, stoff_agg in aggregate.items():
+            entries = stoff_agg.values() if 'thresholds' not in stoff_agg else [stoff_agg]
+            values = {np.nan, -1.0, 0.0, 1e12}
+            for stoff_data in entries:
+                for threshold in stoff_data['thresholds']:
+                    values.update([threshold - 1e-9, threshold, threshold + 1e-9])
+            rows += [(stoff, aggregat, value) for value in values]
+    # Sulfat is always classified with the 'mg/l' thresholds
+    rows += [('Sulfat (SO4)', 'µg/l', value) for value in (100, 250, 500, 2000)]
+    rows += [('Sulfat', 'mg/kg', value) for value in (100, 250, 500, 2000)]
+    rows += [('Unbekannt', 'mg/kg', 1.0), ('Arsen (As)', 'ng/l', 1.0), ('Arsen (As)', np.nan, 1.0)]
+    return rows
+
+
+def edge_table(rows, toc=None):
+    df = pd.DataFrame(rows, columns=['Stoff', 'Aggregat', 'Menge'])
+    if toc is not None:
+        toc_row = pd.DataFrame([('Kohlenstoff(C) organisch (TOC)', '%', toc)], columns=df.columns)
+        df = pd.concat([toc_row, df], ignore_index=True)
+    return df
+
+
+# Samples that set both triggers, each followed by a clean one: every value in its lowest class,
+# except the electrical conductivity, which only becomes relevant with d_trigger set
+def trigger_and_clean_samples(directory, n_samples, seed=7):
+    n_pairs = (n_samples + 1) // 2
+    triggering = read_report(write_report(os.path.join(directory, 'triggering.xlsx'), 'multi', n_pairs, seed=seed,
+                                          distribution='thresholds'))
+    clean = read_report(write_report(os.path.join(directory, 'clean.xlsx'), 'multi', n_pairs, seed=seed,
+                                     distribution='clean'))
+    for df in clean:
+        df.loc[df['Stoff'] == 'elektrische Leitfähigkeit', 'Menge'] = 5000.0
+    return [df for pair in zip(triggering, clean) for df in pair][:n_samples]
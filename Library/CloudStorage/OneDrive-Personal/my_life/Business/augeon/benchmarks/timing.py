@@ -0,0 +1,18 @@
+# Timing helpers of the benchmark scripts
+import time
+
+
+# Wall time of one call and its result
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+# Fastest of repeat calls and the result of the last one
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        seconds, result = timed(func)
+        timings.append(seconds)
+    return min(timings), result
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+############################################################
+#START PRIMARY CLASSIFICATION PART OF CODE
+############################################################
+
+# All BMF class labels, ordered from the lowest to the highest class, so "lowest class"
+# comparisons are integer comparisons on the category codes.
+# '' (no relevant class) and 'Not Classified' are ordered below every real class.
+bmf_classes = [
+    '', 'Not Classified',
+    'BM-0 BG-0', '> BM-0 BG-0', '>BM-0 BG-0',
+    'BM-0* BG-0*', '>BM-0* BG-0*',
+    'BM-F0* BG-F0*', 'BM-F1 BG-F1', 'BM-F2 BG-F2', 'BM-F3 BG-F3', '>BM-F3 BG-F3',
+]
+bmf_class_dtype = pd.CategoricalDtype(bmf_classes, ordered=True)
+
+
+# Integer codes of BMF class labels (-1 for unknown or missing labels)
+def class_codes(values):
+    return np.asarray(pd.Categorical(values, dtype=bmf_class_dtype).codes)
+
+
+# Soil subcategories of classification_table, as offered in app.py, batch.py and service.py
+# ('TOC'/'no_TOC' are chosen by the TOC value of the sample, see lookup_thresholds)
+subcategory_options = ['Sand', 'Lehm Schluff', 'Ton']
+
+# Stoffe, which are always looked up with the 'mg/l' thresholds
+sulfat_stoffe = ['Sulfat', 'Sulfat (SO4)']
+
+# Stoffe, which are "> BM-0 BG-0" instead of ">BM-F3 BG-F3" above their rightmost threshold
+bm0_overflow_stoffe = ["Benzo(a)pyren", "EOX"]
+
+
+# Compile the nested classification_table once into flat threshold arrays
+# Key: (Stoff, Aggregat, subcategory/TOC indicator) - None if there is no subcategory level
+# The thresholds are stored sorted and unique together with the class of the leftmost
+# occurrence of each value, so np.searchsorted(side='right') yields exactly the class
+# of the "smallest threshold larger than Menge"
+def compile_classification_table(classification_table):
+    compiled_table = {}
+    for stoff, aggregate in classification_table.items():
+        for aggregat, stoff_agg in aggregate.items():
+            if isinstance(stoff_agg, dict) and 'thresholds' not in stoff_agg:
+                entries = stoff_agg.items()
+            else:
+                entries = [(None, stoff_agg)]
+
+            for subcategory, stoff_data in entries:
+                thresholds = np.asarray(stoff_data['thresholds'], dtype=float)
+                classifications = class_codes(stoff_data['classifications'])
+                if (classifications < 0).any():
+                    raise ValueError(f"Unknown BMF class in classification_table[{stoff!r}][{aggregat!r}]: "
+                                     f"{stoff_data['classifications']}")
+                values, first_idx = np.unique(thresholds, return_index=True)
+                compiled_table[(stoff, aggregat, subcategory)] = {
+                    'thresholds': values,
+                    'classifications': classifications[first_idx],
+                    'last_threshold': thresholds[-1],
+                }
+    return compiled_table
+
+
+def lookup_thresholds(compiled_table, stoff, aggregat, subcategory, toc_indicator):
+    # Stoff/Aggregat combination without subcategory
+    if (stoff, aggregat, None) in compiled_table:
+        return compiled_table[(stoff, aggregat, None)]
+
+    # Subcategory is needed, fall back to 'toc_indicator' as subcategory
+    for key in (subcategory, toc_indicator):
+        if (stoff, aggregat, key) in compiled_table:
+            return compiled_table[(stoff, aggregat, key)]
+    return None
+
+
+def compute_toc_indicator(df):
+    # Check if 'Kohlenstoff(C) organisch (TOC)' exists in the dataframe
+    toc_rows = df.loc[df['Stoff'] == 'Kohlenstoff(C) organisch (TOC)', 'Menge']
+    if len(toc_rows) and toc_rows.iloc[0] > 0.5:
+        return 'TOC'
+    return 'no_TOC'
+
+
+# Sample level facts, computed once per sample table and read by the classifier and all clauses
+def sample_context(df, subcategory=None):
+    is_eluat = (df['Aggregat'] == 'µg/l').to_numpy(dtype=bool)
+    return {
+        'subcategory': subcategory,
+        'toc_indicator': compute_toc_indicator(df),
+        # Rows with an eluat value (µg/l) and their index per Stoff
+        'is_eluat': is_eluat,
+        'eluat_rows': {stoff: list(rows) for stoff, rows in df[is_eluat].groupby('Stoff', sort=False, observed=True).groups.items()},
+        'is_leitfähigkeit': (df['Stoff'] == 'elektrische Leitfähigkeit').to_numpy(dtype=bool),
+    }
+
+
+def classify_bmf(df, compiled_table, context):
+    has_toc = np.full(len(df), context['toc_indicator'] == 'TOC')
+    df = df.copy()
+    df['BMF_primär'] = classify_rows(df, compiled_table, context['subcategory'], has_toc)
+    return df
+
+
+# Classification of all rows at once; has_toc holds the TOC indicator of each row's sample,
+# so rows of many samples can be classified together
+def classify_rows(df, compiled_table, subcategory, has_toc):
+
+    # Works on the category codes, object columns are converted first
+    stoff = df['Stoff'].astype('category')
+    aggregat = df['Aggregat'].astype('category')
+    menge = pd.to_numeric(df['Menge'], errors='coerce').to_numpy(dtype=float)
+
+    # Map 'Stoff' to 'Aggregat' if needed
+    if 'mg/l' not in aggregat.cat.categories:
+        aggregat = aggregat.cat.add_categories(['mg/l'])
+    aggregat = aggregat.mask(stoff.isin(sulfat_stoffe), 'mg/l')
+
+    stoff_categories = stoff.cat.categories
+    aggregat_categories = aggregat.cat.categories
+    stoff_codes = stoff.cat.codes.to_numpy(dtype=np.int64)
+    aggregat_codes = aggregat.cat.codes.to_numpy(dtype=np.int64)
+
+    bmf_primär = np.full(len(df), bmf_classes.index("Not Classified"), dtype=np.int8)
+    bm0_overflow = bmf_classes.index("> BM-0 BG-0")
+    f3_overflow = bmf_classes.index(">BM-F3 BG-F3")
+
+    # One lookup per (Stoff, Aggregat, TOC indicator) group, grouped by the combined integer code
+    n_aggregat = len(aggregat_categories) + 1
+    keys = ((stoff_codes + 1) * n_aggregat + (aggregat_codes + 1)) * 2 + np.asarray(has_toc, dtype=np.int64)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(unique_keys)))[:-1]
+
+    for key, positions in zip(unique_keys, np.split(order, bounds)):
+        pair, toc_bit = divmod(int(key), 2)
+        stoff_code, aggregat_code = divmod(pair, n_aggregat)
+        if stoff_code == 0 or aggregat_code == 0:
+            continue
+        group_stoff = stoff_categories[stoff_code - 1]
+        group_aggregat = aggregat_categories[aggregat_code - 1]
+        toc_indicator = 'TOC' if toc_bit else 'no_TOC'
+
+        stoff_data = lookup_thresholds(compiled_table, group_stoff, group_aggregat, subcategory, toc_indicator)
+        if stoff_data is None:
+            continue
+
+        thresholds = stoff_data['thresholds']
+        group_menge = menge[positions]
+
+        # Index of the smallest threshold larger than 'menge' (NaN sorts to the end)
+        idx = np.searchsorted(thresholds, group_menge, side='right')
+        valid = idx < len(thresholds)
+        bmf_primär[positions[valid]] = stoff_data['classifications'][idx[valid]]
+
+        # Handle cases where no valid threshold is found
+        overflow = positions[~valid]
+        if group_stoff in bm0_overflow_stoffe:
+            above_last = menge[overflow] > stoff_data['last_threshold']
+            bmf_primär[overflow] = np.where(above_last, bm0_overflow, f3_overflow)
+        else:
+            bmf_primär[overflow] = f3_overflow
+
+    return pd.Categorical.from_codes(bmf_primär, dtype=bmf_class_dtype)
+
+############################################################
+#END PRIMARY CLASSIFICATION PART OF CODE
+############################################################
+
+
+# Smallest possible BMF class per (Stoff, Aggregat) as MultiIndex Series, built once from complete_df_stoffe
+def build_smallest_bmf_index(complete_df_stoffe):
+    index = pd.MultiIndex.from_tuples([(stoff, aggregat) for stoff, aggregat, _ in complete_df_stoffe],
+                                      names=['Stoff', 'Aggregat'])
+    smallest_bmf = pd.Series([smallest for _, _, smallest in complete_df_stoffe], index=index, name='smallest_BMF')
+    # Same as a dict built from the list: the last entry wins
+    return smallest_bmf[~smallest_bmf.index.duplicated(keep='last')]
+
+
+# Class code of smallest_BMF for every row of df, -1 where the combination is unknown
+def lookup_smallest_bmf(df, smallest_bmf):
+    keys = pd.MultiIndex.from_arrays([df['Stoff'].astype(object), df['Aggregat'].astype(object)])
+    return class_codes(smallest_bmf.reindex(keys))
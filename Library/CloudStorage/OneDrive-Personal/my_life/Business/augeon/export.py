@@ -0,0 +1,192 @@
+# Export of the classified sample tables as CSV, Parquet or Excel
+#
+# All writers take the tables one at a time (a list or a generator such as the results of
+# iter_classify_report), so the results of a report never have to be concatenated:
+#   - CSV: header once, then the rows of each sample appended
+#   - Parquet: typed columns, Stoff/Aggregat/BMF classes dictionary encoded, one row group per sample
+#   - Excel: write-only workbook, one sheet per sample, BMF classes coloured by conditional formatting
+# Only CSV runs in constant memory. Until the file is closed, Parquet keeps the metadata of every
+# row group (a few KB per sample) and openpyxl every worksheet object (column widths, formatting
+# rules, 20-40 KB per sample), so both grow with the number of samples (see benchmarks/bench_export.py).
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from classification import bmf_classes
+
+############################################################
+#START TABLE EXPORT PART OF CODE
+############################################################
+
+# Categorical columns are stored as dictionary encoded strings (the pandas category codes),
+# the BMF classes with their order, so they are read back as ordered categoricals
+category_type = pa.dictionary(pa.int8(), pa.string())
+class_type = pa.dictionary(pa.int8(), pa.string(), ordered=True)
+
+result_fields = [
+    ('Probe', pa.int32()),
+    ('Stoff', category_type),
+    ('Aggregat', category_type),
+    ('Menge', pa.float64()),
+    ('Qualifier', pa.string()),
+    ('BMF_primär', class_type),
+    ('BMF_sekundär', class_type),
+    ('Relevante_Klassen', class_type),
+]
+
+
+# extra_fields are put in front, e.g. [('Datei', pa.string())] for batch runs
+def export_schema(extra_fields=()):
+    return pa.schema(list(extra_fields) + result_fields)
+
+
+# Result tables with their 1-based sample number as first column
+def with_probe(final_dfs):
+    for idx, final_df in enumerate(final_dfs):
+        yield final_df.assign(Probe=idx + 1)[['Probe'] + [column for column in final_df.columns if column != 'Probe']]
+
+
+def open_table_writer(target, kind, schema=None):
+    if kind == 'parquet':
+        schema = schema or export_schema()
+        return {'kind': kind, 'schema': schema, 'writer': pq.ParquetWriter(target, schema, compression='zstd')}
+    if kind == 'csv':
+        close = isinstance(target, str)
+        file = open(target, 'w', newline='', encoding='utf-8') if close else target
+        return {'kind': kind, 'file': file, 'close': close, 'header': True}
+    raise ValueError(f"Unknown export format: {kind}")
+
+
+def write_table_frame(writer, df):
+    if writer['kind'] == 'parquet':
+        table = pa.Table.from_pandas(df[writer['schema'].names], schema=writer['schema'], preserve_index=False)
+        writer['writer'].write_table(table)
+    else:
+        df.to_csv(writer['file'], index=False, header=writer['header'])
+        writer['header'] = False
+
+
+def close_table_writer(writer):
+    if writer['kind'] == 'parquet':
+        writer['writer'].close()
+    elif writer['close']:
+        writer['file'].close()
+
+
+def write_tables(frames, target, kind, schema=None):
+    writer = open_table_writer(target, kind, schema)
+    try:
+        for df in frames:
+            write_table_frame(writer, df)
+    finally:
+        close_table_writer(writer)
+
+
+# Same columns as before the Parquet and Excel export existed (no Probe column)
+def csv_bytes(final_dfs):
+    buffer = io.StringIO()
+    write_tables(final_dfs, buffer, 'csv')
+    return buffer.getvalue().encode('utf-8')
+
+
+def parquet_bytes(final_dfs):
+    buffer = io.BytesIO()
+    write_tables(with_probe(final_dfs), buffer, 'parquet')
+    return buffer.getvalue()
+
+############################################################
+#END TABLE EXPORT PART OF CODE
+############################################################
+
+
+############################################################
+#START EXCEL EXPORT PART OF CODE
+############################################################
+
+# Fill colour per BMF class, from green (lowest class) to dark red (above BM-F3)
+class_colors = {
+    'BM-0 BG-0': 'C6EFCE',
+    '> BM-0 BG-0': 'E2EFDA',
+    '>BM-0 BG-0': 'E2EFDA',
+    'BM-0* BG-0*': 'DDEBF7',
+    '>BM-0* BG-0*': 'BDD7EE',
+    'BM-F0* BG-F0*': 'FFF2CC',
+    'BM-F1 BG-F1': 'FFE699',
+    'BM-F2 BG-F2': 'F8CBAD',
+    'BM-F3 BG-F3': 'F4B084',
+    '>BM-F3 BG-F3': 'FF7C80',
+    'Not Classified': 'D9D9D9',
+}
+
+class_columns = ['BMF_primär', 'BMF_sekundär', 'Relevante_Klassen']
+
+
+def class_rules():
+    rules = []
+    for label in bmf_classes:
+        if label in class_colors:
+            fill = PatternFill(fill_type='solid', start_color=class_colors[label], end_color=class_colors[label])
+            rules.append(CellIsRule(operator='equal', formula=[f'"{label}"'], fill=fill))
+    return rules
+
+
+def excel_value(value):
+    # Missing values (NaN, None) stay empty cells, numbers stay numbers
+    if value is None or value != value:
+        return None
+    return value
+
+
+def write_excel(final_dfs, target):
+    # Write-only workbooks stream the rows of every sheet to temporary files
+    workbook = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    rules = class_rules()
+
+    for idx, final_df in enumerate(final_dfs):
+        sheet = workbook.create_sheet(title=f"Probe {idx + 1}")
+        columns = list(final_df.columns)
+        sheet.freeze_panes = 'A2'
+        for col_idx, column in enumerate(columns, start=1):
+            sheet.column_dimensions[get_column_letter(col_idx)].width = 48 if column == 'Stoff' else 18
+
+        # One rule per class over all class columns at once
+        last_row = len(final_df) + 1
+        letters = [get_column_letter(columns.index(column) + 1) for column in class_columns if column in columns]
+        if letters and last_row > 1:
+            cell_ranges = ' '.join(f"{letter}2:{letter}{last_row}" for letter in letters)
+            for rule in rules:
+                sheet.conditional_formatting.add(cell_ranges, rule)
+
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(sheet, value=column)
+            cell.font = header_font
+            header.append(cell)
+        sheet.append(header)
+
+        # Categorical columns as their labels, Menge as number
+        for row in final_df.astype({column: object for column in final_df.select_dtypes('category').columns}).itertuples(index=False):
+            sheet.append([excel_value(value) for value in row])
+        # Finish the sheet now: an open write-only sheet keeps its xml writer in memory until save
+        sheet.close()
+
+    if not workbook.worksheets:
+        workbook.create_sheet(title="Keine Proben")
+    workbook.save(target)
+
+
+def excel_bytes(final_dfs):
+    buffer = io.BytesIO()
+    write_excel(final_dfs, buffer)
+    return buffer.getvalue()
+
+############################################################
+#END EXCEL EXPORT PART OF CODE
+############################################################
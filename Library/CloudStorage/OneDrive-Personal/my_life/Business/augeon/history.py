@@ -0,0 +1,207 @@
+# Optional local store of past classification results (SQLite, one file)
+#
+# Every classified report is appended once per (report hash, subcategory, fremdbestandteile
+# flag, reference version), with one row per result row of each sample. The BMF classes are
+# stored as their ordered codes (see bmf_classes), so "worse than BM-F1" is an indexed range:
+#   history = open_history()
+#   record_report(history, results, report_hash, 'Sand', True, reference['version'], file_name='bericht.xlsx')
+#   query_history(history, stoff='Blei (Pb)', above_class='BM-F1 BG-F1', since='2025-01-01')
+#
+# Written by app.py (sidebar option) and batch.py --history, browsed in pages/Verlauf.py.
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from classification import bmf_classes, bmf_class_dtype, class_codes
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.environ.get('BMF_HISTORY_PATH', os.path.join(BASE_DIR, 'bmf_history.sqlite'))
+
+# Increase whenever the tables below change
+HISTORY_VERSION = 1
+
+schema = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    report_id INTEGER PRIMARY KEY,
+    report_hash TEXT NOT NULL,
+    file_name TEXT,
+    subcategory TEXT NOT NULL,
+    fremdbestandteile_under_10 INTEGER NOT NULL,
+    reference_version TEXT NOT NULL,
+    classified_at TEXT NOT NULL,
+    UNIQUE (report_hash, subcategory, fremdbestandteile_under_10, reference_version)
+);
+CREATE TABLE IF NOT EXISTS results (
+    report_id INTEGER NOT NULL REFERENCES reports (report_id) ON DELETE CASCADE,
+    classified_at TEXT NOT NULL,
+    probe INTEGER NOT NULL,
+    stoff TEXT NOT NULL,
+    aggregat TEXT,
+    menge REAL,
+    qualifier TEXT,
+    bmf_primaer INTEGER,
+    bmf_sekundaer INTEGER,
+    relevante_klassen INTEGER
+);
+CREATE INDEX IF NOT EXISTS results_report ON results (report_id);
+CREATE INDEX IF NOT EXISTS results_date ON results (classified_at);
+CREATE INDEX IF NOT EXISTS results_stoff_primaer ON results (stoff, bmf_primaer, classified_at);
+CREATE INDEX IF NOT EXISTS results_stoff_relevant ON results (stoff, relevante_klassen, classified_at);
+CREATE INDEX IF NOT EXISTS results_primaer ON results (bmf_primaer, classified_at);
+CREATE INDEX IF NOT EXISTS results_relevant ON results (relevante_klassen, classified_at);
+"""
+# The UNIQUE constraint of reports also serves as the index on report_hash
+
+# Result columns that can be filtered by class -> column in the results table
+class_columns = {
+    'BMF_primär': 'bmf_primaer',
+    'BMF_sekundär': 'bmf_sekundaer',
+    'Relevante_Klassen': 'relevante_klassen',
+}
+
+query_columns = ['Datum', 'Datei', 'Report_Hash', 'Subkategorie', 'Probe', 'Stoff', 'Aggregat', 'Menge', 'Qualifier',
+                 'BMF_primär', 'BMF_sekundär', 'Relevante_Klassen']
+
+
+# Raises ValueError if the file was written with other BMF class codes or another layout
+def open_history(path=HISTORY_PATH):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    # Readers (e.g. the Verlauf page) are not blocked while a report is appended
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(schema)
+
+    expected = {'history_version': str(HISTORY_VERSION), 'bmf_classes': json.dumps(bmf_classes, ensure_ascii=False)}
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", expected.items())
+    stored = dict(conn.execute("SELECT key, value FROM meta"))
+    for key, value in expected.items():
+        if stored[key] != value:
+            conn.close()
+            raise ValueError(f"History {path} was written with another {key}, use a new BMF_HISTORY_PATH")
+
+    # One connection shared by the threads of the Streamlit server
+    return {'path': path, 'conn': conn, 'lock': threading.Lock()}
+
+
+def close_history(history):
+    history['conn'].close()
+
+
+def timestamp(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def column_values(values):
+    return [None if pd.isna(value) else value for value in values.tolist()]
+
+
+def code_values(values):
+    return [code if code >= 0 else None for code in class_codes(values).tolist()]
+
+
+# results: the result tables of one report with a 1-based Probe column (see export.with_probe)
+# Returns the report_id, or None if this report was already stored with the same parameters
+def record_report(history, results, report_hash, subcategory, fremdbestandteile_under_10, reference_version,
+                  file_name=None, classified_at=None):
+    stamp = timestamp(classified_at or datetime.now())
+    n_rows = len(results)
+    columns = [
+        [stamp] * n_rows,
+        [int(probe) for probe in results['Probe'].tolist()],
+        results['Stoff'].astype(str).tolist(),
+        column_values(results['Aggregat']),
+        column_values(results['Menge'].astype(float)),
+        column_values(results['Qualifier']),
+        code_values(results['BMF_primär']),
+        code_values(results['BMF_sekundär']),
+        code_values(results['Relevante_Klassen']),
+    ]
+
+    with history['lock'], history['conn'] as conn:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO reports (report_hash, file_name, subcategory, fremdbestandteile_under_10,"
+            " reference_version, classified_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (report_hash, file_name, subcategory, int(bool(fremdbestandteile_under_10)), reference_version, stamp))
+        if cursor.rowcount == 0:
+            return None
+        report_id = cursor.lastrowid
+        conn.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         ((report_id,) + row for row in zip(*columns)))
+    return report_id
+
+
+# All filters are optional and combined with AND:
+#   stoff        exact Stoff name
+#   above_class  only rows whose class in column is worse than this class (e.g. 'BM-F1 BG-F1')
+#   column       'Relevante_Klassen', 'BMF_primär' or 'BMF_sekundär'
+#   since/until  classification date range, until exclusive (dates, datetimes or ISO strings)
+#   report_hash  SHA-256 of the uploaded file (see ingestion.file_hash)
+# Newest results first, at most limit rows
+def query_history(history, stoff=None, above_class=None, column='Relevante_Klassen', since=None, until=None,
+                  report_hash=None, limit=None):
+    if column not in class_columns:
+        raise ValueError(f"Unknown class column: {column} ({', '.join(class_columns)})")
+    if above_class is not None and above_class not in bmf_classes:
+        raise ValueError(f"Unknown BMF class: {above_class!r}")
+
+    conditions, params = [], []
+    if stoff is not None:
+        conditions.append("r.stoff = ?")
+        params.append(stoff)
+    if above_class is not None:
+        conditions.append(f"r.{class_columns[column]} > ?")
+        params.append(bmf_classes.index(above_class))
+    if since is not None:
+        conditions.append("r.classified_at >= ?")
+        params.append(timestamp(since))
+    if until is not None:
+        conditions.append("r.classified_at < ?")
+        params.append(timestamp(until))
+    if report_hash is not None:
+        conditions.append("p.report_hash = ?")
+        params.append(report_hash)
+
+    sql = ("SELECT r.classified_at, p.file_name, p.report_hash, p.subcategory, r.probe, r.stoff, r.aggregat, r.menge,"
+           " r.qualifier, r.bmf_primaer, r.bmf_sekundaer, r.relevante_klassen"
+           " FROM results r JOIN reports p ON p.report_id = r.report_id")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY r.classified_at DESC, r.report_id, r.probe, r.rowid"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+
+    with history['lock']:
+        rows = history['conn'].execute(sql, params).fetchall()
+
+    df = pd.DataFrame(rows, columns=query_columns)
+    df['Datum'] = pd.to_datetime(df['Datum'])
+    df['Menge'] = df['Menge'].astype(float)
+    for label in class_columns:
+        codes = df[label].fillna(-1).to_numpy(dtype=np.int64)
+        df[label] = pd.Categorical.from_codes(codes, dtype=bmf_class_dtype)
+    return df
+
+
+# Stoff names in the store, for filter dropdowns
+def history_stoffe(history):
+    with history['lock']:
+        return [stoff for (stoff,) in history['conn'].execute("SELECT DISTINCT stoff FROM results ORDER BY stoff")]
+
+
+def history_counts(history):
+    with history['lock']:
+        reports, = history['conn'].execute("SELECT COUNT(*) FROM reports").fetchone()
+        rows, = history['conn'].execute("SELECT COUNT(*) FROM results").fetchone()
+    return {'reports': reports, 'rows': rows}
@@ -0,0 +1,183 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from profiling import measure_stage
+
+############################################################
+#START DATA PART OF CODE
+############################################################
+
+# Define filter_values
+filter_values = [
+    "Kohlenstoff(C) organisch (TOC)",
+    "EOX",
+    "Arsen (As)",
+    "Blei (Pb)",
+    "Cadmium (Cd)",
+    "Chrom (Cr)",
+    "Kupfer (Cu)",
+    "Nickel (Ni)",
+    "Quecksilber (Hg)",
+    "Thallium (Tl)",
+    "Zink (Zn)",
+    "Kohlenwasserstoffe C10-C22 (GC)",
+    "Kohlenwasserstoffe C10-C40",
+    "Benzo(a)pyren",
+    "PAK EPA Summe gem. ErsatzbaustoffV",
+    "PCB 7 Summe gem. ErsatzbaustoffV",
+    "pH-Wert",
+    "elektrische Leitfähigkeit",
+    "Sulfat (SO4)",
+    "Naphthalin/Methylnaph.-Summe gem. ErsatzbaustoffV",
+    "PAK 15 Summe gem. ErsatzbaustoffV"
+]
+
+# Fixed categories of the Stoff and Aggregat columns
+stoff_dtype = pd.CategoricalDtype(filter_values)
+
+# Units used in classification_table and complete_df_stoffe
+aggregat_units = ['%', 'mg/kg', 'µg/l', 'mg/l', 'µS/cm', '-']
+
+
+# Units which are not known are appended, so no value is lost
+def aggregat_dtype(values):
+    extra = sorted(set(values.dropna().astype(str)) - set(aggregat_units))
+    return pd.CategoricalDtype(aggregat_units + extra)
+
+
+# Comparison qualifier at the start of a laboratory value, e.g. '<0,5' or '>= 10'
+qualifier_pattern = r'^\s*(<=|>=|≤|≥|<|>)'
+qualifier_names = {'<=': '≤', '>=': '≥'}
+
+
+# Clean and convert the 'Menge' column to numeric in one vectorized pass
+# Returns the numeric values and the comparison qualifier (<, ≤, >, ≥ or None) as two Series
+def parse_menge(values):
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        # Same 'no qualifier' marker as the text branch (pd.Series(None, dtype=object) would give NaN)
+        qualifier = pd.Series([None] * len(values), index=values.index, dtype=object)
+        return pd.to_numeric(values, errors='coerce').astype(float), qualifier
+
+    # Lab columns repeat the same few strings, so only the distinct cells are parsed
+    codes, uniques = pd.factorize(values.astype(object))
+    uniques = pd.Series(uniques, dtype=object)
+
+    # .str yields NaN for all cells which are not strings (numbers from Excel)
+    text = uniques.str
+    qualifier = text.extract(qualifier_pattern, expand=False).replace(qualifier_names)
+    cleaned = text.replace(r'[<>=≤≥]', '', regex=True).str.replace(',', '.', regex=False).str.strip()
+
+    is_text = cleaned.notna()
+    menge = pd.to_numeric(cleaned.where(is_text), errors='coerce').astype(float)
+    menge[~is_text] = pd.to_numeric(uniques[~is_text], errors='coerce')
+
+    # Missing cells have code -1
+    menge = np.append(menge.to_numpy(dtype=float), np.nan)[codes]
+    qualifier = np.append(qualifier.astype(object).where(qualifier.notna(), None).to_numpy(dtype=object), None)[codes]
+    return pd.Series(menge, index=values.index), pd.Series(qualifier, index=values.index, dtype=object)
+
+
+# SHA-256 of the uploaded file content, used as cache key
+def file_hash(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+# Read the first sheet of the workbook exactly once. Read-only mode streams the
+# sheet xml instead of building the full cell object model.
+def read_sheet_rows(uploaded_file):
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Read-only mode trusts the <dimension> tag, which many non-Excel writers leave at "A1"
+        sheet.reset_dimensions()
+        rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+    # Trailing empty rows carry no data (pd.read_excel drops them as well)
+    while rows and all(pd.isna(value) for value in rows[-1]):
+        rows.pop()
+    return rows
+
+
+def cell(rows, row_idx, col_idx):
+    if row_idx < len(rows) and col_idx < len(rows[row_idx]):
+        return rows[row_idx][col_idx]
+    return None
+
+
+# Determine the header row and the sample columns from the already loaded rows
+# Returns (header_row, value_columns) with zero-based indexes like pd.read_excel
+def detect_layout(rows):
+
+    # Step 1: Check if column F exists and if F6 has data
+    f6_exists = not pd.isna(cell(rows, 5, 5))
+
+    # Step 2: Based on whether F6 exists and is not empty, proceed accordingly
+    if not f6_exists:  # Cell F6 is empty or out of bounds: one sample table
+        # Determine the header row based on cell values
+        if cell(rows, 9, 0) == "Parameter":
+            header_row = 10
+        elif cell(rows, 6, 0) == "Parameter":
+            header_row = 7
+        elif cell(rows, 13, 0) == "PARAMETER MIT BEWERTUNG NACH MANTELV":
+            header_row = 15
+        else:
+            raise ValueError("Unknown Excel format")
+
+        return header_row, [4]
+
+    # Cell F6 is not empty: multiple sample tables side by side
+    # Check how many columns starting from column E are not empty
+    non_empty_columns = sum(not pd.isna(value) for value in rows[5][4:])
+    return 10, [4 + i for i in range(non_empty_columns)]
+
+
+# Filtering and cleaning of a single (Stoff, Aggregat, Menge) table
+def prepare_table(df):
+    df = df[df["Stoff"].isin(filter_values)]
+    menge, qualifier = parse_menge(df['Menge'])
+    df['Menge'] = menge
+    df.insert(df.columns.get_loc('Menge') + 1, 'Qualifier', qualifier)
+
+    # Update 'Aggregat' for 'pH-Wert'
+    df.loc[df['Stoff'] == 'pH-Wert', 'Aggregat'] = '-'
+
+    # Delete the row where 'Stoff' is 'Benzo(a)pyren' and 'Aggregat' is 'µg/l'
+    df = df[~((df['Stoff'] == 'Benzo(a)pyren') & (df['Aggregat'] == 'µg/l'))]
+    df = df.reset_index(drop=True)
+
+    # Compact categorical columns, all later comparisons work on the integer codes
+    df['Stoff'] = df['Stoff'].astype(stoff_dtype)
+    df['Aggregat'] = df['Aggregat'].astype(aggregat_dtype(df['Aggregat']))
+    return df
+
+
+# Single pass reader: one workbook parse, layout detection and all sample tables
+def read_report(uploaded_file, profiler=None):
+    with measure_stage(profiler, 'read_sheet_rows') as record:
+        rows = read_sheet_rows(uploaded_file)
+        if record is not None:
+            record['rows'] = len(rows)
+    header_row, value_columns = detect_layout(rows)
+
+    data_rows = rows[header_row + 1:]
+    stoff = [cell(data_rows, i, 0) for i in range(len(data_rows))]
+    aggregat = [cell(data_rows, i, 1) for i in range(len(data_rows))]
+
+    dataframes = []
+    for probe, col_idx in enumerate(value_columns, start=1):
+        with measure_stage(profiler, 'prepare_table', rows=len(data_rows), probe=probe):
+            menge = [cell(data_rows, i, col_idx) for i in range(len(data_rows))]
+            df = pd.DataFrame({'Stoff': stoff, 'Aggregat': aggregat, 'Menge': menge})
+            dataframes.append(prepare_table(df))
+    return dataframes
+
+############################################################
+#END DATA PART OF CODE
+############################################################
@@ -0,0 +1,53 @@
+import streamlit as st
+st.set_page_config(layout="wide")  # Set the layout to wide
+import time
+from datetime import date, timedelta
+
+from classification import bmf_classes
+from history import open_history, query_history, history_stoffe, history_counts, class_columns
+
+# At most this many rows are sent to the browser, the count above the table says if there are more
+MAX_ROWS = 10000
+
+
+# Same store as the main page writes to (history.py)
+@st.cache_resource
+def get_history():
+    return open_history()
+
+
+history = get_history()
+
+st.title("Verlauf")
+st.write("""
+Frühere Klassifizierungen durchsuchen, z.B. alle Proben, in denen Blei (Pb) im letzten Jahr schlechter als BM-F1 war.
+""")
+
+counts = history_counts(history)
+if counts['reports'] == 0:
+    st.info("Noch keine Ergebnisse gespeichert. Aktiviere 'Ergebnisse im Verlauf speichern' auf der Hauptseite "
+            "oder nutze batch.py --history.")
+else:
+    stoff_column, class_column, above_column, date_column = st.columns(4)
+    stoff = stoff_column.selectbox('Stoff', ['Alle'] + history_stoffe(history))
+    column = class_column.selectbox('Klassen Spalte', list(class_columns), index=list(class_columns).index('Relevante_Klassen'))
+    above_class = above_column.selectbox('Schlechter als', ['Alle'] + [label for label in bmf_classes if label])
+    today = date.today()
+    date_range = date_column.date_input('Zeitraum', (today - timedelta(days=365), today))
+    report_hash = st.text_input('Report Hash (optional)').strip()
+
+    # While a range is being picked only the start date is set
+    since = date_range[0] if len(date_range) > 0 else None
+    until = date_range[1] + timedelta(days=1) if len(date_range) > 1 else None
+
+    start = time.perf_counter()
+    results = query_history(history, stoff=None if stoff == 'Alle' else stoff,
+                            above_class=None if above_class == 'Alle' else above_class, column=column,
+                            since=since, until=until, report_hash=report_hash or None, limit=MAX_ROWS + 1)
+    elapsed = time.perf_counter() - start
+
+    shown = min(len(results), MAX_ROWS)
+    more = " (weitere Zeilen nicht angezeigt, Filter eingrenzen)" if len(results) > MAX_ROWS else ""
+    st.caption(f"{shown} Zeilen{more} in {elapsed * 1000:.1f} ms, "
+               f"{counts['rows']} Zeilen aus {counts['reports']} Berichten gespeichert")
+    st.dataframe(results.head(MAX_ROWS), hide_index=True, use_container_width=True)
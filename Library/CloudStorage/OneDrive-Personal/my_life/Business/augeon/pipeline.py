@@ -0,0 +1,445 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from classification import sample_context, classify_bmf, classify_rows
+from classification import lookup_smallest_bmf, class_codes, bmf_classes, bmf_class_dtype
+from profiling import measure_stage
+from reference import get_compiled_table, get_smallest_bmf
+
+############################################################
+#START DETAILED CLASSIFICATION PART OF CODE
+############################################################
+
+def check_combinations(df, smallest_bmf):
+    # Extract the combinations of Stoff and Aggregat from the new dataframe
+    current_combinations = pd.MultiIndex.from_arrays([df['Stoff'], df['Aggregat']])
+
+    # Only compare the first two values (Stoff and Aggregat) from complete_df_stoffe
+    present = smallest_bmf.index.isin(current_combinations)
+
+    # Identify the missing combinations
+    missing_combinations = smallest_bmf.index[~present].tolist()
+
+    # If there are missing combinations, raise an error with details
+    if missing_combinations:
+        raise ValueError(f"Missing combinations: {missing_combinations}")
+
+###############################################################
+# Step one: Initialize new columns and apply default conditions
+
+
+
+# Erklärung der drei Spalten
+# BMF_primär = Primäre Klassifizierung ohne Fußnoten
+# BMF_sekundär = Sekundäre Klassifizierung inklusive aller Fußnoten
+# Relevante_Klassen = Ausschließlich für die Ausweisung relevante Klassen
+
+# Definition der relevanten Spalten für die Eluat Klausel Funktion
+# Ausnahme von Stoffen, welche nur BM-0* und gar nicht BM-0 werden können: - 
+#     - Naphthalin/Methylnaph.-Summe gem. ErsatzbaustoffV
+#     - EOX
+#     - TOC
+#     - Beide Kohlenwasserstoffe
+#     - Alle Eluat-Werte
+#     - elektr. Leitfähigkeit
+#     - pH-Wert
+# 11 Stoffe, welche einen Eluat Wert haben, der bei "BM-0*" Klasse geprüft werden muss
+
+
+eluat_stoffe = [
+    'Arsen (As)', 'Blei (Pb)', 'Cadmium (Cd)', 'Chrom (Cr)', 'Kupfer (Cu)',
+    'Nickel (Ni)', 'Quecksilber (Hg)', 'Thallium (Tl)', 'Zink (Zn)',
+    'PAK EPA Summe gem. ErsatzbaustoffV', 'PCB 7 Summe gem. ErsatzbaustoffV'
+]
+eluat_list = eluat_stoffe.copy()
+
+#Definition der Stoffe, welche in ihrer F-Klasse relevant sind und alle Eluat Werte triggern
+# Naphthalin, beide PCBs, EOX und Benzo(a)pyren haben keine F-Klasse, daher auch nicht in Eskalationsliste
+f_eskalation_stoffe = [
+    'Arsen (As)', 'Blei (Pb)', 'Cadmium (Cd)', 'Chrom (Cr)', 'Kupfer (Cu)',
+    'Nickel (Ni)', 'Quecksilber (Hg)', 'Thallium (Tl)', 'Zink (Zn)',
+    'PAK EPA Summe gem. ErsatzbaustoffV', 'Sulfat (SO4)', 'Kohlenwasserstoffe C10-C22 (GC)',
+    'Kohlenwasserstoffe C10-C40', 'Kohlenstoff(C) organisch (TOC)', 'EOX', 'PCB 7 Summe gem. ErsatzbaustoffV'
+]
+f_eskalation_list = f_eskalation_stoffe.copy()
+
+alle_stoffe = [
+    'Arsen (As)', 'Blei (Pb)', 'Cadmium (Cd)', 'Chrom (Cr)', 'Kupfer (Cu)',
+    'Nickel (Ni)', 'Quecksilber (Hg)', 'Thallium (Tl)', 'Zink (Zn)',
+    'PAK EPA Summe gem. ErsatzbaustoffV', 'Sulfat (SO4)', 'Kohlenwasserstoffe C10-C22 (GC)',
+    'Kohlenwasserstoffe C10-C40', 'Kohlenstoff(C) organisch (TOC)', 'EOX', 'PCB 7 Summe gem. ErsatzbaustoffV'
+]
+
+# Definition der kritischen Klassen, welche eine Eskalation auslösen
+bmf_f_list = ['>BM-0* BG-0*', 'BM-F0* BG-F0*', 'BM-F1 BG-F1', 'BM-F2 BG-F2', 'BM-F3 BG-F3']
+
+# Zustand der Eskalationen, pro Probe neu angelegt und von jeder Stufe zurückgegeben
+def initial_state():
+    return {
+        # Definition eines triggers, welcher alle Stoffe für die Auswertung relevant macht (F-Klasse bei einem der Stoffe)
+        # Konsequenz: Jeder Stoff wird in der Auswertung berücksichtigt
+        'f_trigger': False,
+
+        # Definition eines triggers, welcher relevant wird, wenn eine Feststoff Klasse im BM-0* liegt
+        # Konsequenz: Elektrische Leitfähigkeit wird in der Auswertung berücksichtigt
+        'd_trigger': False,
+    }
+
+###############################################################
+# Step two: Initialize eluat and f-trigger functions
+
+def eluat_klausel(df, context, state):
+
+    state = dict(state)
+
+    # Checken welche Stoffe relevant sind für die Eluat Klausel, und ob ein Stoff ausschlägt
+    eluat_condition = df['Stoff'].isin(eluat_list) & ~context['is_eluat'] & (df['BMF_primär'] == 'BM-0* BG-0*')
+    eluat_relevant = df.loc[eluat_condition, 'Stoff'].unique().tolist()
+
+    if eluat_relevant: 
+
+        state['d_trigger'] = True
+
+        # Für alle Werte, die BM-0* erfüllen, relevante Klassen ausfüllen 
+        df.loc[eluat_condition, ['Relevante_Klassen']] = 'BM-0* BG-0*'
+
+        # Für jeden Wert in die Fallprüfung gehen
+        for stoff in eluat_relevant:
+            eluat_rows = context['eluat_rows'].get(stoff)
+            if eluat_rows is None:
+                continue
+
+            # Falls der Eluat Wert in der BM-0* Klasse liegt, nichts tun
+            bmf_klass_ug_l = df.at[eluat_rows[0], 'BMF_primär']
+            if bmf_klass_ug_l == 'BM-0* BG-0*':
+                continue
+
+            # !!GROßER ELUATESKALATIONSFALL EINS!!
+            # Falls der Eluat in einer kritische Klasse liegt, triggert das den großen Eluat Eskalationsfall
+            elif bmf_klass_ug_l in bmf_f_list:
+
+                # Erste Konsequenz: Die relevante Klasse für diesen Eluat Wert ausfüllen
+                df.loc[eluat_rows, 'Relevante_Klassen'] = bmf_klass_ug_l
+
+                # Zweite Konsequenz: Der F-Klasse trigger wird aktiviert, was für die Auswertung relevanter Werte später relevant ist
+                state['f_trigger'] = True
+
+    return df, state
+
+def f_klausel(df, context, state):
+
+    state = dict(state)
+
+    # Checken welche Stoffe relevant sind für die F-trigger Klausel, und ob ein Stoff ausschlägt
+    f_condition = df['Stoff'].isin(f_eskalation_list) & ~context['is_eluat'] & (df['BMF_primär'].isin(bmf_f_list))
+    f_relevant = df.loc[f_condition, 'Stoff'].unique().tolist()
+
+    if f_relevant: 
+
+        # F-klausel aktivieren, falls Stoffe in dieser liste sind
+        state['f_trigger'] = True
+
+        # Nicht notwendig, die relevante Klasse auszufüllen, denn das wird später eh gemacht, da der f_trigger aktiviert ist
+
+    return df, state
+
+
+# Erste Relevanzprüfung:
+# - Wenn f_trigger true 
+#     -> Alle Stoffe prüfen
+#     -> Wenn ein Stoff nicht seine niedrigmöglichste  Klasse hat, dann in relevante Spalte schreiben
+# - Wenn d_trigger true
+#     -> elektrische Leitfähigkeit prüfen und wenn nicht in niedrigster Klasse, dann in relevante Spalte schreiben
+
+
+
+def erste_relevanzprüfung(df, context, state, smallest_bmf):
+
+    # Lookup the smallest_BMF for the combination of Stoff and Aggregat (class codes, -1 if unknown)
+    smallest = lookup_smallest_bmf(df, smallest_bmf)
+    bmf_sekundär = class_codes(df['BMF_sekundär'])
+
+    # Check if the BMF_sekundär is not equal to the smallest_BMF
+    not_smallest = (smallest >= 0) & (bmf_sekundär != smallest)
+
+    # Checken, ob irgendein Stoff nicht seine kleinste BMF Klasse hat ->  Falls Ja: Übertrag in relevante Spalte
+    if state['f_trigger'] == True:
+        df.loc[not_smallest, 'Relevante_Klassen'] = df.loc[not_smallest, 'BMF_sekundär']
+
+    # Nur elektrische Leitfähigkeit prüfen
+    if state['d_trigger'] == True:
+        relevant = not_smallest & context['is_leitfähigkeit']
+        df.loc[relevant, 'Relevante_Klassen'] = df.loc[relevant, 'BMF_sekundär']
+
+    return df
+
+
+###############################################################
+# Step four: Define more special cases
+
+# TODO!!
+
+############################################################
+#END DETAILED CLASSIFICATION PART OF CODE
+############################################################
+
+
+############################################################
+#START PUT IT ALL TOGETHER PART OF CODE
+############################################################
+
+# profiler/probe: optional stage timings, see profiling.py
+# check=False skips the combination check, for samples already checked by check_report_combinations
+def fullpipeline(df, reference, subcategory="Sand", eluat=True, fremdbestandteile_under_10=True, profiler=None, probe=None,
+                 check=True):
+    n_rows = len(df)
+
+    # Missing (Stoff, Aggregat) pairs fail before any classification work
+    if check:
+        with measure_stage(profiler, 'check_combinations', n_rows, probe):
+            check_combinations(df, get_smallest_bmf(reference))
+
+    # Sample level facts (TOC indicator, eluat rows, ...) are computed once per sample
+    with measure_stage(profiler, 'sample_context', n_rows, probe):
+        context = sample_context(df, subcategory=subcategory)
+
+    # Triggers of this sample only, nothing leaks into the next sample
+    state = initial_state()
+
+    # 1 Step: Apply the classify_bmf function to the dataframe with the given subcategory
+    with measure_stage(profiler, 'classify_bmf', n_rows, probe):
+        df = classify_bmf(df, get_compiled_table(reference), context)
+        df['BMF_sekundär'] = df['BMF_primär']
+        df['Relevante_Klassen'] = pd.Categorical([''] * len(df), dtype=bmf_class_dtype)
+
+    # 3 Step: Eluat Prüfung
+    if eluat:
+        with measure_stage(profiler, 'eluat_klausel', n_rows, probe):
+            df, state = eluat_klausel(df, context, state)
+
+    # 4 Step: F-Klasse Prüfung
+    with measure_stage(profiler, 'f_klausel', n_rows, probe):
+        df, state = f_klausel(df, context, state)
+
+    # 5 Step: Erste Relevanzprüfung 
+    with measure_stage(profiler, 'erste_relevanzprüfung', n_rows, probe):
+        df = erste_relevanzprüfung(df, context, state, get_smallest_bmf(reference))
+    return df
+
+
+# Checks every sample of a report at once, before the first one is classified
+def check_report_combinations(dataframes, reference, profiler=None):
+    if not dataframes:
+        return
+    n_rows = sum(len(df) for df in dataframes)
+    with measure_stage(profiler, 'check_combinations', n_rows):
+        keys = pd.DataFrame({
+            'Stoff': np.concatenate([df['Stoff'].to_numpy(dtype=object) for df in dataframes]),
+            'Aggregat': np.concatenate([df['Aggregat'].to_numpy(dtype=object) for df in dataframes]),
+        })
+        probe = np.repeat(np.arange(len(dataframes)), [len(df) for df in dataframes])
+        check_combinations_long(keys, probe, len(dataframes), get_smallest_bmf(reference))
+
+
+# Classify all sample tables of one report
+# By default all samples are classified together in one long table (columnar=True),
+# otherwise one fullpipeline run per sample, with max_workers > 1 in a thread pool
+# check=False skips check_report_combinations, if the caller already ran it
+def classify_report(dataframes, reference, subcategory="Sand", fremdbestandteile_under_10=True, max_workers=None, columnar=True,
+                    profiler=None, check=True):
+    def run(df, probe):
+        return fullpipeline(df, reference, subcategory=subcategory, eluat=True, fremdbestandteile_under_10=fremdbestandteile_under_10,
+                            profiler=profiler, probe=probe, check=False)
+
+    if not dataframes:
+        return []
+    if check:
+        check_report_combinations(dataframes, reference, profiler=profiler)
+
+    probes = range(1, len(dataframes) + 1)
+    if max_workers is not None and max_workers > 1 and len(dataframes) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run, dataframes, probes))
+
+    if columnar:
+        with measure_stage(profiler, 'to_long', sum(len(df) for df in dataframes)):
+            long_df = to_long(dataframes)
+        long_df = fullpipeline_long(long_df, reference, subcategory=subcategory, eluat=True,
+                                    fremdbestandteile_under_10=fremdbestandteile_under_10, profiler=profiler)
+        with measure_stage(profiler, 'split_long', len(long_df)):
+            return split_long(long_df, len(dataframes))
+
+    return [run(df, probe) for df, probe in zip(dataframes, probes)]
+
+
+# Same results as classify_report, but yields (sample index, result table) as soon as a chunk of
+# samples is done. The chunks grow 1, 2, 4, ... up to max_chunk_size, so the first sample is
+# shown right away and larger reports still profit from the columnar classification
+def iter_classify_report(dataframes, reference, subcategory="Sand", fremdbestandteile_under_10=True, max_chunk_size=32,
+                         profiler=None):
+    # A sample with missing combinations fails the whole report before the first sample is yielded
+    check_report_combinations(dataframes, reference, profiler=profiler)
+
+    start, chunk_size = 0, 1
+    while start < len(dataframes):
+        chunk = dataframes[start:start + chunk_size]
+        final_dfs = classify_report(chunk, reference, subcategory=subcategory,
+                                    fremdbestandteile_under_10=fremdbestandteile_under_10, profiler=profiler, check=False)
+        for offset, final_df in enumerate(final_dfs):
+            yield start + offset, final_df
+        start += len(chunk)
+        chunk_size = min(chunk_size * 2, max_chunk_size)
+
+
+# Compact overview of one classified sample: the worst relevant class and the Stoffe causing it
+def sample_summary(idx, final_df):
+    relevante = final_df['Relevante_Klassen']
+    worst = relevante.max() if len(final_df) else ''
+    worst_rows = final_df[(relevante == worst) & (relevante != '')]
+    return {
+        'Probe': idx + 1,
+        'Schlechteste_Klasse': worst,
+        'Maßgebende_Stoffe': ', '.join(dict.fromkeys(worst_rows['Stoff'].astype(str))),
+        'Relevante_Werte': int((relevante != '').sum()),
+        'Höchste_BMF_primär': final_df['BMF_primär'].max() if len(final_df) else '',
+    }
+
+############################################################
+#END PUT IT ALL TOGETHER PART OF CODE
+############################################################
+
+
+############################################################
+#START LONG TABLE PART OF CODE
+############################################################
+
+# All samples of a report in one long table keyed by (Probe, Stoff, Aggregat).
+# The same steps as fullpipeline, but every clause runs as one grouped, vectorized
+# operation over all samples instead of a Python loop per sample.
+
+def to_long(dataframes):
+    long_df = pd.concat(dataframes, keys=range(len(dataframes)), names=['Probe', None])
+    return long_df.reset_index(level=0).reset_index(drop=True)
+
+
+# Integer code of every row's (Probe, Stoff) pair
+def probe_stoff_codes(probe, df):
+    stoff_codes = df['Stoff'].astype('category').cat.codes.to_numpy(dtype=np.int64)
+    return probe * (stoff_codes.max(initial=0) + 2) + stoff_codes + 1
+
+
+def toc_per_probe(df, probe, n_probes):
+    # First 'Kohlenstoff(C) organisch (TOC)' row of each sample decides
+    is_toc = (df['Stoff'] == 'Kohlenstoff(C) organisch (TOC)').to_numpy(dtype=bool)
+    toc_probes, first = np.unique(probe[is_toc], return_index=True)
+    has_toc = np.zeros(n_probes, dtype=bool)
+    has_toc[toc_probes] = df['Menge'].to_numpy(dtype=float)[is_toc][first] > 0.5
+    return has_toc
+
+
+def eluat_klausel_long(df, probe, n_probes, state):
+    state = {key: value.copy() for key, value in state.items()}
+    stoff = df['Stoff']
+    is_eluat = (df['Aggregat'] == 'µg/l').to_numpy(dtype=bool)
+    bmf_primär = class_codes(df['BMF_primär'])
+
+    # Checken welche Stoffe relevant sind für die Eluat Klausel, und ob ein Stoff ausschlägt
+    eluat_condition = stoff.isin(eluat_list).to_numpy() & ~is_eluat & (bmf_primär == bmf_classes.index('BM-0* BG-0*'))
+    state['d_trigger'] |= np.bincount(probe[eluat_condition], minlength=n_probes) > 0
+    df.loc[eluat_condition, 'Relevante_Klassen'] = 'BM-0* BG-0*'
+
+    # Die erste Eluat Zeile (µg/l) jedes (Probe, Stoff) Paares entscheidet
+    pairs = probe_stoff_codes(probe, df)
+    eluat_positions = np.flatnonzero(is_eluat)
+    eluat_pairs, first = np.unique(pairs[eluat_positions], return_index=True)
+    first_class = bmf_primär[eluat_positions[first]]
+
+    # !!GROßER ELUATESKALATIONSFALL EINS!!
+    escalating = np.isin(eluat_pairs, pairs[eluat_condition]) & np.isin(first_class, class_codes(bmf_f_list))
+    escalating_pairs = eluat_pairs[escalating]
+
+    # Erste Konsequenz: Die relevante Klasse für diese Eluat Werte ausfüllen
+    rows = eluat_positions[np.isin(pairs[eluat_positions], escalating_pairs)]
+    row_class = first_class[escalating][np.searchsorted(escalating_pairs, pairs[rows])]
+    relevante = class_codes(df['Relevante_Klassen']).copy()
+    relevante[rows] = row_class
+    df['Relevante_Klassen'] = pd.Categorical.from_codes(relevante, dtype=bmf_class_dtype)
+
+    # Zweite Konsequenz: Der F-Klasse trigger der betroffenen Proben wird aktiviert
+    state['f_trigger'] |= np.bincount(probe[rows], minlength=n_probes) > 0
+    return df, state
+
+
+def f_klausel_long(df, probe, n_probes, state):
+    state = {key: value.copy() for key, value in state.items()}
+    is_eluat = (df['Aggregat'] == 'µg/l').to_numpy(dtype=bool)
+    f_condition = df['Stoff'].isin(f_eskalation_list).to_numpy() & ~is_eluat & df['BMF_primär'].isin(bmf_f_list).to_numpy()
+    state['f_trigger'] |= np.bincount(probe[f_condition], minlength=n_probes) > 0
+    return df, state
+
+
+def erste_relevanzprüfung_long(df, probe, state, smallest_bmf):
+    smallest = lookup_smallest_bmf(df, smallest_bmf)
+    not_smallest = (smallest >= 0) & (class_codes(df['BMF_sekundär']) != smallest)
+    is_leitfähigkeit = (df['Stoff'] == 'elektrische Leitfähigkeit').to_numpy(dtype=bool)
+
+    relevant = not_smallest & (state['f_trigger'][probe] | (state['d_trigger'][probe] & is_leitfähigkeit))
+    df.loc[relevant, 'Relevante_Klassen'] = df.loc[relevant, 'BMF_sekundär']
+    return df
+
+
+def check_combinations_long(df, probe, n_probes, smallest_bmf):
+    keys = pd.MultiIndex.from_arrays([df['Stoff'].astype(object), df['Aggregat'].astype(object)])
+    combination = smallest_bmf.index.get_indexer(keys)
+    known = combination >= 0
+
+    present = np.zeros((n_probes, len(smallest_bmf)), dtype=bool)
+    present[probe[known], combination[known]] = True
+    for idx in range(n_probes):
+        if not present[idx].all():
+            missing_combinations = smallest_bmf.index[~present[idx]].tolist()
+            raise ValueError(f"Missing combinations: {missing_combinations}")
+
+
+# Stage timings cover all samples at once (probe None)
+# The combinations are checked beforehand by classify_report (check_report_combinations)
+def fullpipeline_long(long_df, reference, subcategory="Sand", eluat=True, fremdbestandteile_under_10=True, profiler=None):
+    n_rows = len(long_df)
+    probe = long_df['Probe'].to_numpy(dtype=np.int64)
+    n_probes = int(probe.max()) + 1 if len(probe) else 0
+    state = {'f_trigger': np.zeros(n_probes, dtype=bool), 'd_trigger': np.zeros(n_probes, dtype=bool)}
+
+    # 1 Step: Classification of all samples, each row with the TOC indicator of its sample
+    with measure_stage(profiler, 'classify_bmf', n_rows):
+        df = long_df.copy()
+        has_toc = toc_per_probe(df, probe, n_probes)[probe]
+        df['BMF_primär'] = classify_rows(df, get_compiled_table(reference), subcategory, has_toc)
+        df['BMF_sekundär'] = df['BMF_primär']
+        df['Relevante_Klassen'] = pd.Categorical([''] * len(df), dtype=bmf_class_dtype)
+
+    # 3 Step: Eluat Prüfung
+    if eluat:
+        with measure_stage(profiler, 'eluat_klausel', n_rows):
+            df, state = eluat_klausel_long(df, probe, n_probes, state)
+
+    # 4 Step: F-Klasse Prüfung
+    with measure_stage(profiler, 'f_klausel', n_rows):
+        df, state = f_klausel_long(df, probe, n_probes, state)
+
+    # 5 Step: Erste Relevanzprüfung
+    with measure_stage(profiler, 'erste_relevanzprüfung', n_rows):
+        df = erste_relevanzprüfung_long(df, probe, state, get_smallest_bmf(reference))
+    return df
+
+
+# Long table result back into one DataFrame per sample, like classify_report returns them
+def split_long(long_df, n_probes):
+    groups = long_df.groupby('Probe', sort=True).indices
+    return [long_df.iloc[groups[idx]].drop(columns='Probe').reset_index(drop=True) if idx in groups
+            else long_df.iloc[:0].drop(columns='Probe') for idx in range(n_probes)]
+
+############################################################
+#END LONG TABLE PART OF CODE
+############################################################
@@ -0,0 +1,77 @@
+# Opt-in stage level profiling of ingestion and classification
+#
+# A profiler is a plain dict created by new_profiler() and passed down as profiler=...;
+# with profiler=None (the default everywhere) measure_stage returns a shared no-op
+# context manager, so switched off it costs one comparison per stage.
+#
+# Every stage records wall time, rows processed and, with trace_memory=True, the peak
+# memory allocated by Python while the stage ran (tracemalloc, process wide, so the
+# numbers of stages running at the same time in a thread pool overlap).
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+no_profiling = nullcontext()
+
+# tracemalloc has one peak counter per process, stages measuring memory run one at a time
+memory_lock = threading.RLock()
+
+
+def new_profiler(trace_memory=False):
+    return {'records': [], 'trace_memory': trace_memory}
+
+
+# probe: 1-based sample number, None for stages over the whole report
+def measure_stage(profiler, stage, rows=None, probe=None):
+    if profiler is None:
+        return no_profiling
+    return record_stage(profiler, stage, rows, probe)
+
+
+# Yields the record, so rows only known at the end of the stage can still be filled in
+@contextmanager
+def record_stage(profiler, stage, rows, probe):
+    record = {'stage': stage, 'probe': probe, 'rows': rows, 'seconds': None, 'peak_bytes': None}
+    trace_memory = profiler['trace_memory']
+    if trace_memory:
+        memory_lock.acquire()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        memory_start = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        if trace_memory:
+            record['peak_bytes'] = max(tracemalloc.get_traced_memory()[1] - memory_start, 0)
+            if started_tracing:
+                tracemalloc.stop()
+            memory_lock.release()
+        profiler['records'].append(record)
+
+
+def profile_table(profiler):
+    columns = ['stage', 'probe', 'rows', 'seconds', 'peak_bytes']
+    return pd.DataFrame(profiler['records'], columns=columns)
+
+
+# Total time, rows and the largest peak per stage, slowest stage first
+def profile_summary(profiler):
+    table = profile_table(profiler)
+    summary = table.groupby('stage', sort=False).agg(
+        calls=('seconds', 'size'), seconds=('seconds', 'sum'), rows=('rows', 'sum'),
+        peak_bytes=('peak_bytes', 'max'))
+    return summary.sort_values('seconds', ascending=False).reset_index()
+
+
+def profile_json(profiler, **extra):
+    return json.dumps({**extra, 'trace_memory': profiler['trace_memory'], 'records': profiler['records']},
+                      ensure_ascii=False, indent=2)
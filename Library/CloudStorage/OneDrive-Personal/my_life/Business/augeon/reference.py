@@ -0,0 +1,312 @@
+# Reference tables: classification_table.pkl and complete_df_stoffe.pkl
+#
+# The pickles can be compiled into one flat, versioned Arrow file, which is memory-mapped
+# on load, so all batch workers and Streamlit sessions share one copy of the arrays:
+#   python reference.py            (writes reference_tables.arrow next to the pickles)
+# Without the Arrow file (or if it is outdated) the pickles are loaded directly.
+#
+# Loading validates the tables and fails fast with all problems at once; the compiled lookup
+# structures are only built on first use (get_compiled_table, get_smallest_bmf), so e.g. a
+# result cache hit or a health check never pays for them.
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import warnings
+
+import numpy as np
+import pyarrow as pa
+
+from classification import compile_classification_table, build_smallest_bmf_index, bmf_classes
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Increase whenever the layout of the Arrow file changes
+SCHEMA_VERSION = 1
+ARTIFACT_NAME = 'reference_tables.arrow'
+PICKLE_NAMES = ['classification_table.pkl', 'complete_df_stoffe.pkl']
+
+artifact_schema = pa.schema([
+    ('Stoff', pa.string()),
+    ('Aggregat', pa.string()),
+    ('Subkategorie', pa.string()),
+    ('Schwelle', pa.float64()),
+    ('Klasse', pa.int8()),
+    ('Letzte_Schwelle', pa.float64()),
+])
+
+
+# SHA-256 over both pickle files, identifies the version of the reference tables
+def source_hash(base_dir=BASE_DIR):
+    digest = hashlib.sha256()
+    for name in PICKLE_NAMES:
+        with open(os.path.join(base_dir, name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def load_pickles(base_dir=BASE_DIR):
+
+    # Load the dictionary from the pickle file
+    with open(os.path.join(base_dir, 'classification_table.pkl'), 'rb') as file:
+        classification_table = pickle.load(file)
+
+    # Load the list from the pickle file
+    with open(os.path.join(base_dir, 'complete_df_stoffe.pkl'), 'rb') as file:
+        complete_df_stoffe = pickle.load(file)
+
+    return classification_table, complete_df_stoffe
+
+
+############################################################
+#START VALIDATION PART OF CODE
+############################################################
+
+def entry_problems(name, stoff_data):
+    if not isinstance(stoff_data, dict) or 'thresholds' not in stoff_data or 'classifications' not in stoff_data:
+        return [f"{name}: needs 'thresholds' and 'classifications'"]
+
+    thresholds, classifications = stoff_data['thresholds'], stoff_data['classifications']
+    problems = []
+    if len(thresholds) == 0:
+        problems.append(f"{name}: no thresholds")
+    if len(thresholds) != len(classifications):
+        problems.append(f"{name}: {len(thresholds)} thresholds but {len(classifications)} classifications")
+    try:
+        values = np.asarray(thresholds, dtype=float)
+    except (TypeError, ValueError):
+        return problems + [f"{name}: thresholds are not numeric: {thresholds}"]
+    if np.isnan(values).any():
+        problems.append(f"{name}: thresholds contain NaN")
+    elif (np.diff(values) < 0).any():
+        problems.append(f"{name}: thresholds are not sorted ascending: {thresholds}")
+    unknown = [label for label in classifications if label not in bmf_classes]
+    if unknown:
+        problems.append(f"{name}: unknown BMF classes {unknown}")
+    return problems
+
+
+# Raises one ValueError listing every problem of the two reference tables
+def validate_reference_tables(classification_table, complete_df_stoffe):
+    problems = []
+    known_pairs = set()
+    for stoff, aggregate in classification_table.items():
+        if not isinstance(aggregate, dict):
+            problems.append(f"classification_table[{stoff!r}]: expected a dict of Aggregat entries")
+            continue
+        for aggregat, stoff_agg in aggregate.items():
+            known_pairs.add((stoff, aggregat))
+            name = f"classification_table[{stoff!r}][{aggregat!r}]"
+            # Either one entry, or one entry per subcategory/TOC indicator
+            if not isinstance(stoff_agg, dict) or 'thresholds' in stoff_agg or 'classifications' in stoff_agg:
+                problems += entry_problems(name, stoff_agg)
+            elif not stoff_agg:
+                problems.append(f"{name}: no entries")
+            else:
+                for subcategory, stoff_data in stoff_agg.items():
+                    problems += entry_problems(f"{name}[{subcategory!r}]", stoff_data)
+
+    for row in complete_df_stoffe:
+        if len(row) != 3:
+            problems.append(f"complete_df_stoffe: expected (Stoff, Aggregat, smallest class), got {row!r}")
+            continue
+        stoff, aggregat, smallest = row
+        if (stoff, aggregat) not in known_pairs:
+            problems.append(f"complete_df_stoffe: {(stoff, aggregat)!r} has no thresholds in classification_table")
+        if smallest not in bmf_classes:
+            problems.append(f"complete_df_stoffe: unknown BMF class {smallest!r} for {(stoff, aggregat)!r}")
+
+    if problems:
+        raise ValueError("Invalid reference tables:\n  - " + "\n  - ".join(problems))
+
+############################################################
+#END VALIDATION PART OF CODE
+############################################################
+
+
+# Reference dict with version information only; build() returns the compiled structures
+def lazy_reference(version, source, build):
+    return {'version': version, 'source': source, 'build': build, 'lock': threading.Lock()}
+
+
+def reference_structures(reference):
+    if 'compiled_table' not in reference:
+        with reference['lock']:
+            if 'compiled_table' not in reference:
+                structures = reference['build']()
+                reference['smallest_bmf'] = structures['smallest_bmf']
+                reference['compiled_table'] = structures['compiled_table']
+    return reference
+
+
+# Threshold lookup arrays, see compile_classification_table
+def get_compiled_table(reference):
+    return reference_structures(reference)['compiled_table']
+
+
+# Smallest possible BMF class per (Stoff, Aggregat)
+def get_smallest_bmf(reference):
+    return reference_structures(reference)['smallest_bmf']
+
+
+def reference_from_pickles(base_dir=BASE_DIR):
+    classification_table, complete_df_stoffe = load_pickles(base_dir)
+    validate_reference_tables(classification_table, complete_df_stoffe)
+
+    def build():
+        return {
+            'compiled_table': compile_classification_table(classification_table),
+            'smallest_bmf': build_smallest_bmf_index(complete_df_stoffe),
+        }
+
+    return lazy_reference(f"{SCHEMA_VERSION}-{source_hash(base_dir)[:12]}", 'pickle', build)
+
+
+############################################################
+#START ARTIFACT PART OF CODE
+############################################################
+
+def build_artifact(base_dir=BASE_DIR, path=None):
+    path = path or os.path.join(base_dir, ARTIFACT_NAME)
+    classification_table, complete_df_stoffe = load_pickles(base_dir)
+    validate_reference_tables(classification_table, complete_df_stoffe)
+    compiled_table = compile_classification_table(classification_table)
+    smallest_bmf = build_smallest_bmf_index(complete_df_stoffe)
+
+    columns = {name: [] for name in artifact_schema.names}
+    for (stoff, aggregat, subcategory), stoff_data in compiled_table.items():
+        n_thresholds = len(stoff_data['thresholds'])
+        if n_thresholds == 0 or len(stoff_data['classifications']) != n_thresholds:
+            raise ValueError(f"Invalid thresholds for {(stoff, aggregat, subcategory)}")
+        if not np.isfinite(stoff_data['thresholds']).all():
+            raise ValueError(f"Thresholds of {(stoff, aggregat, subcategory)} are not finite")
+        columns['Stoff'] += [stoff] * n_thresholds
+        columns['Aggregat'] += [aggregat] * n_thresholds
+        columns['Subkategorie'] += [subcategory] * n_thresholds
+        columns['Schwelle'] += stoff_data['thresholds'].tolist()
+        columns['Klasse'] += stoff_data['classifications'].tolist()
+        columns['Letzte_Schwelle'] += [stoff_data['last_threshold']] * n_thresholds
+
+    metadata = {
+        'schema_version': str(SCHEMA_VERSION),
+        'source_sha256': source_hash(base_dir),
+        'bmf_classes': json.dumps(bmf_classes, ensure_ascii=False),
+        'smallest_bmf': json.dumps([[stoff, aggregat, smallest] for (stoff, aggregat), smallest
+                                    in smallest_bmf.items()], ensure_ascii=False),
+    }
+    table = pa.table(columns, schema=artifact_schema.with_metadata(metadata))
+
+    # Uncompressed IPC file with a single record batch, so it can be memory-mapped without copies.
+    # Written next to the target and renamed over it: running processes keep their mapping of the
+    # old file, truncating it in place would kill them with SIGBUS on the next access.
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(len(table), 1))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def column_view(table, name):
+    column = table.column(name)
+    if column.num_chunks == 0:
+        return np.array([], dtype=column.type.to_pandas_dtype())
+    return column.chunk(0).to_numpy(zero_copy_only=True)
+
+
+# Raises ValueError if the file does not match the current schema or the pickles
+def load_artifact(path, expected_source_hash=None):
+    reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+    metadata = {key.decode(): value.decode() for key, value in (reader.schema.metadata or {}).items()}
+
+    if metadata.get('schema_version') != str(SCHEMA_VERSION):
+        raise ValueError(f"Schema version {metadata.get('schema_version')} != {SCHEMA_VERSION}")
+    if not reader.schema.remove_metadata().equals(artifact_schema):
+        raise ValueError("Unexpected columns in the reference artifact")
+    if json.loads(metadata['bmf_classes']) != bmf_classes:
+        raise ValueError("BMF class labels changed since the artifact was built")
+    if expected_source_hash is not None and metadata['source_sha256'] != expected_source_hash:
+        raise ValueError("Artifact is outdated, the pickles have changed")
+
+    table = reader.read_all().combine_chunks()
+
+    # Zero-copy views on the memory-mapped buffers
+    thresholds = column_view(table, 'Schwelle')
+    classes = column_view(table, 'Klasse')
+    last_thresholds = column_view(table, 'Letzte_Schwelle')
+    keys = list(zip(table.column('Stoff').to_pylist(), table.column('Aggregat').to_pylist(),
+                    table.column('Subkategorie').to_pylist()))
+
+    # Rows of one (Stoff, Aggregat, Subkategorie) group are stored next to each other
+    bounds = [0] + [idx for idx in range(1, len(keys)) if keys[idx] != keys[idx - 1]] + [len(keys)]
+    smallest_rows = [tuple(row) for row in json.loads(metadata['smallest_bmf'])]
+    validate_artifact(keys, bounds, thresholds, classes, smallest_rows)
+
+    def build():
+        compiled_table = {}
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            compiled_table[keys[start]] = {
+                'thresholds': thresholds[start:end],
+                'classifications': classes[start:end],
+                'last_threshold': float(last_thresholds[start]),
+            }
+        return {'compiled_table': compiled_table, 'smallest_bmf': build_smallest_bmf_index(smallest_rows)}
+
+    return lazy_reference(f"{SCHEMA_VERSION}-{metadata['source_sha256'][:12]}", 'artifact', build)
+
+
+# Same guarantees as validate_reference_tables, checked on the flat artifact columns
+def validate_artifact(keys, bounds, thresholds, classes, smallest_rows):
+    if ((classes < 0) | (classes >= len(bmf_classes))).any():
+        raise ValueError("Artifact contains unknown BMF class codes")
+    if not np.isfinite(thresholds).all():
+        raise ValueError("Artifact thresholds are not finite")
+
+    group_keys = [keys[start] for start in bounds[:-1]]
+    if len(set(group_keys)) != len(group_keys):
+        raise ValueError("Artifact groups are not stored next to each other")
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if (np.diff(thresholds[start:end]) < 0).any():
+            raise ValueError(f"Artifact thresholds of {keys[start]} are not sorted")
+
+    pairs = {(stoff, aggregat) for stoff, aggregat, _ in group_keys}
+    missing = [row[:2] for row in smallest_rows if row[:2] not in pairs]
+    if missing:
+        raise ValueError(f"Artifact has no thresholds for {missing}")
+    unknown = [row for row in smallest_rows if row[2] not in bmf_classes]
+    if unknown:
+        raise ValueError(f"Artifact contains unknown smallest classes {unknown}")
+
+############################################################
+#END ARTIFACT PART OF CODE
+############################################################
+
+
+# Load both reference tables, preferring the memory-mapped artifact
+def load_reference(base_dir=BASE_DIR):
+    path = os.path.join(base_dir, ARTIFACT_NAME)
+    if os.path.exists(path):
+        # Without the pickles (e.g. a deployment with only the artifact) there is nothing to compare against
+        has_pickles = all(os.path.exists(os.path.join(base_dir, name)) for name in PICKLE_NAMES)
+        try:
+            return load_artifact(path, expected_source_hash=source_hash(base_dir) if has_pickles else None)
+        except (ValueError, KeyError, OSError, pa.ArrowException) as e:
+            # Unreadable or half-written files included, the pickles are always a valid source
+            warnings.warn(f"Reference artifact not usable ({e}), loading the pickles instead", RuntimeWarning,
+                          stacklevel=2)
+    return reference_from_pickles(base_dir)
+
+
+if __name__ == '__main__':
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else BASE_DIR
+    artifact_path = build_artifact(base_dir)
+    print(f"Written {artifact_path} (schema version {SCHEMA_VERSION})")
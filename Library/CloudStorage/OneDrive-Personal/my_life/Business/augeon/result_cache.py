@@ -0,0 +1,162 @@
+# Persistent on-disk cache for parsed uploads and classification results
+#
+# Parsed sample tables are keyed by the SHA-256 of the upload, classified results by
+# (file hash, subcategory, fremdbestandteile flag, reference table version).
+# Every entry is one pickle file; the file modification time is the last access time,
+# so the least recently used entries are deleted once the cache is larger than max_bytes.
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+
+from ingestion import read_report, file_hash
+from pipeline import iter_classify_report
+from profiling import measure_stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get('BMF_CACHE_DIR', os.path.join(BASE_DIR, '.bmf_cache'))
+MAX_BYTES = int(os.environ.get('BMF_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Increase whenever read_report or classify_report return different tables for the same input
+CACHE_VERSION = 2
+
+
+def open_cache(cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    os.makedirs(cache_dir, exist_ok=True)
+    return {
+        'dir': cache_dir,
+        'max_bytes': max_bytes,
+        'stats': {'parsed': {'hits': 0, 'misses': 0}, 'results': {'hits': 0, 'misses': 0}},
+    }
+
+
+def parsed_key(upload_hash):
+    return f"parsed-{CACHE_VERSION}-{upload_hash}"
+
+
+def result_key(upload_hash, subcategory, fremdbestandteile_under_10, reference_version):
+    params = json.dumps([CACHE_VERSION, upload_hash, subcategory, bool(fremdbestandteile_under_10), reference_version])
+    return f"result-{hashlib.sha256(params.encode('utf-8')).hexdigest()}"
+
+
+def entry_path(cache, key):
+    return os.path.join(cache['dir'], key + '.pkl')
+
+
+# Returns None on a miss; unreadable entries (e.g. from an older pandas) count as misses and are removed
+def cache_get(cache, key, kind):
+    path = entry_path(cache, key)
+    try:
+        with open(path, 'rb') as file:
+            value = pickle.load(file)
+        os.utime(path)
+    except FileNotFoundError:
+        value = None
+    except Exception:
+        value = None
+        remove_entry(path)
+
+    cache['stats'][kind]['hits' if value is not None else 'misses'] += 1
+    return value
+
+
+def cache_put(cache, key, value):
+    # Write to a temporary file first, so concurrent readers never see half written entries
+    fd, tmp_path = tempfile.mkstemp(dir=cache['dir'], suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path(cache, key))
+    except BaseException:
+        remove_entry(tmp_path)
+        raise
+    evict(cache)
+
+
+def remove_entry(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def cache_entries(cache):
+    entries = []
+    for entry in os.scandir(cache['dir']):
+        if entry.name.endswith('.pkl'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def cache_size(cache):
+    return sum(size for _, size, _ in cache_entries(cache))
+
+
+# Delete the least recently used entries until the cache fits into max_bytes
+def evict(cache):
+    entries = sorted(cache_entries(cache))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= cache['max_bytes']:
+            break
+        remove_entry(path)
+        total -= size
+
+
+# Sample tables of an upload, the workbook is only parsed on a miss
+def cached_read_report(cache, file_bytes, upload_hash=None, profiler=None):
+    upload_hash = upload_hash or file_hash(file_bytes)
+    key = parsed_key(upload_hash)
+    with measure_stage(profiler, 'cache_get_parsed'):
+        dataframes = cache_get(cache, key, 'parsed')
+    if dataframes is None:
+        dataframes = read_report(io.BytesIO(file_bytes), profiler=profiler)
+        with measure_stage(profiler, 'cache_put_parsed'):
+            cache_put(cache, key, dataframes)
+    return dataframes
+
+
+# Classified sample tables of an upload; a repeat run skips both parsing and classification
+# Returns the number of samples and an iterator over (sample index, result table), which
+# classifies the samples step by step on a miss (see iter_classify_report)
+def iter_cached_classify_report(cache, file_bytes, reference, subcategory="Sand", fremdbestandteile_under_10=True, profiler=None):
+    upload_hash = file_hash(file_bytes)
+    key = result_key(upload_hash, subcategory, fremdbestandteile_under_10, reference['version'])
+    with measure_stage(profiler, 'cache_get_results'):
+        final_dfs = cache_get(cache, key, 'results')
+    if final_dfs is not None:
+        return len(final_dfs), enumerate(final_dfs)
+
+    dataframes = cached_read_report(cache, file_bytes, upload_hash, profiler=profiler)
+
+    def results():
+        final_dfs = []
+        for idx, final_df in iter_classify_report(dataframes, reference, subcategory=subcategory,
+                                                  fremdbestandteile_under_10=fremdbestandteile_under_10, profiler=profiler):
+            final_dfs.append(final_df)
+            yield idx, final_df
+        # Only complete results are stored
+        with measure_stage(profiler, 'cache_put_results'):
+            cache_put(cache, key, final_dfs)
+
+    return len(dataframes), results()
+
+
+def cached_classify_report(cache, file_bytes, reference, subcategory="Sand", fremdbestandteile_under_10=True, profiler=None):
+    _, results = iter_cached_classify_report(cache, file_bytes, reference, subcategory=subcategory,
+                                             fremdbestandteile_under_10=fremdbestandteile_under_10, profiler=profiler)
+    return [final_df for _, final_df in results]
+
+
+def format_stats(cache):
+    parsed = cache['stats']['parsed']
+    results = cache['stats']['results']
+    return (f"Cache: Ergebnisse {results['hits']} Treffer / {results['misses']} neu berechnet, "
+            f"Tabellen {parsed['hits']} Treffer / {parsed['misses']} neu eingelesen, "
+            f"{cache_size(cache) / 1024 / 1024:.1f} von {cache['max_bytes'] / 1024 / 1024:.0f} MB belegt")
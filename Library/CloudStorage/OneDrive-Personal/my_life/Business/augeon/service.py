@@ -0,0 +1,267 @@
+# Headless HTTP classification service (plain ASGI app, no framework)
+#
+# Start:
+#   uvicorn service:app --host 0.0.0.0 --port 8000
+#   python service.py --port 8000 --workers 4
+#
+# Endpoints:
+#   GET  /health     -> {"status": "ok", "reference_version": ...}
+#   POST /classify?subcategory=Sand&fremdbestandteile=yes
+#        body: the .xlsx report (any content type except JSON), or JSON with already parsed rows:
+#        {"samples": [[{"Stoff": ..., "Aggregat": ..., "Menge": ...}, ...], ...]}
+#        (subcategory and fremdbestandteile_under_10 may also be given in the JSON body)
+#        -> {"reference_version": ..., "samples": [{"Probe": 1, "summary": {...}, "rows": [...]}, ...]}
+#
+# Every error is answered with {"error": ...}: 400/404/405/413 for the request itself (including
+# JSON rows without string Stoff/Aggregat or with a non scalar Menge), 422 for reports that are no
+# valid .xlsx file or cannot be classified, 500 for anything else.
+#
+# Parsing and classification run in a process pool, every worker process loads the
+# reference tables once (workers.init_worker) and keeps them for all requests.
+import argparse
+import asyncio
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs
+from zipfile import BadZipFile
+
+import pandas as pd
+from openpyxl.utils.exceptions import InvalidFileException
+
+from classification import subcategory_options
+from ingestion import read_report, prepare_table
+from pipeline import classify_report, sample_summary
+from reference import load_reference
+from workers import init_worker, worker_reference
+
+MAX_BODY_BYTES = int(os.environ.get('BMF_SERVICE_MAX_BODY_BYTES', 20 * 1024 * 1024))
+
+flag_values = {'yes': True, 'true': True, '1': True, 'no': False, 'false': False, '0': False}
+
+############################################################
+#START WORKER PART OF CODE
+############################################################
+
+# Row dicts of one result table, JSON ready (categories as labels, missing values as null)
+def table_records(final_df):
+    return final_df.astype(object).where(final_df.notna(), None).to_dict('records')
+
+
+# Runs in the worker process: parse (xlsx bytes or JSON samples), classify and serialize
+def classify_request(kind, payload, subcategory, fremdbestandteile_under_10):
+    if kind == 'xlsx':
+        dataframes = read_report(io.BytesIO(payload))
+    else:
+        dataframes = [prepare_table(pd.DataFrame(rows, columns=['Stoff', 'Aggregat', 'Menge'])) for rows in payload]
+
+    reference = worker_reference()
+    final_dfs = classify_report(dataframes, reference, subcategory=subcategory,
+                                fremdbestandteile_under_10=fremdbestandteile_under_10)
+    samples = []
+    for idx, final_df in enumerate(final_dfs):
+        summary = sample_summary(idx, final_df)
+        samples.append({'Probe': idx + 1, 'summary': {key: value for key, value in summary.items() if key != 'Probe'},
+                        'rows': table_records(final_df)})
+    return {'reference_version': reference['version'], 'subcategory': subcategory,
+            'fremdbestandteile_under_10': fremdbestandteile_under_10, 'samples': samples}
+
+############################################################
+#END WORKER PART OF CODE
+############################################################
+
+
+############################################################
+#START HTTP PART OF CODE
+############################################################
+
+# Process pool and reference version of this server process, created on startup (or the first request)
+service_state = {'pool': None, 'reference_version': None}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# BMF_SERVICE_WORKERS: number of worker processes (default: CPU count)
+def start_service():
+    if service_state['pool'] is None:
+        workers = os.environ.get('BMF_SERVICE_WORKERS')
+        service_state['reference_version'] = load_reference()['version']
+        service_state['pool'] = ProcessPoolExecutor(max_workers=int(workers) if workers else None, initializer=init_worker)
+
+
+# wait=False only drops the pool (for a broken pool inside a request, without blocking the event loop)
+def stop_service(wait=True):
+    if service_state['pool'] is not None:
+        service_state['pool'].shutdown(wait=wait, cancel_futures=True)
+        service_state['pool'] = None
+
+
+async def send_json(send, status, body):
+    data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json; charset=utf-8'),
+                            (b'content-length', str(len(data)).encode())]})
+    await send({'type': 'http.response.body', 'body': data})
+
+
+async def read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise RequestError(400, "Client disconnected")
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise RequestError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+def parse_flag(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() not in flag_values:
+        raise RequestError(400, f"Invalid fremdbestandteile value: {value!r} (yes/no)")
+    return flag_values[str(value).lower()]
+
+
+# One JSON row: Stoff and Aggregat as strings, Menge as number, string ('<0,5') or null
+def check_row(sample_idx, row_idx, row):
+    where = f"samples[{sample_idx}][{row_idx}]"
+    if not isinstance(row, dict):
+        raise RequestError(400, f"{where}: row must be an object with Stoff, Aggregat and Menge")
+    for key in ('Stoff', 'Aggregat'):
+        if not isinstance(row.get(key), str):
+            raise RequestError(400, f"{where}: {key} must be a string")
+    menge = row.get('Menge')
+    if isinstance(menge, bool) or not (menge is None or isinstance(menge, (int, float, str))):
+        raise RequestError(400, f"{where}: Menge must be a number, a string or null")
+
+
+# Request body and parameters -> arguments of classify_request
+def parse_classify_request(scope, body):
+    query = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode('utf-8')).items()}
+    subcategory = query.get('subcategory', 'Sand')
+    fremdbestandteile = query.get('fremdbestandteile', 'yes')
+
+    headers = dict(scope.get('headers', []))
+    content_type = headers.get(b'content-type', b'').decode('latin-1').split(';')[0].strip().lower()
+    if not body:
+        raise RequestError(400, "Empty request body, expected an .xlsx report or JSON samples")
+
+    if content_type == 'application/json':
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise RequestError(400, f"Invalid JSON: {e}")
+        samples = data.get('samples') if isinstance(data, dict) else None
+        if not isinstance(samples, list) or not all(isinstance(rows, list) for rows in samples):
+            raise RequestError(400, "JSON body needs 'samples': a list of row lists")
+        for sample_idx, rows in enumerate(samples):
+            for row_idx, row in enumerate(rows):
+                check_row(sample_idx, row_idx, row)
+        subcategory = data.get('subcategory', subcategory)
+        fremdbestandteile = data.get('fremdbestandteile_under_10', fremdbestandteile)
+        kind, payload = 'json', samples
+    else:
+        kind, payload = 'xlsx', body
+
+    if subcategory not in subcategory_options:
+        raise RequestError(400, f"Invalid subcategory: {subcategory!r} ({', '.join(subcategory_options)})")
+    return kind, payload, subcategory, parse_flag(fremdbestandteile)
+
+
+async def handle_http(scope, receive, send):
+    path, method = scope['path'].rstrip('/') or '/', scope['method']
+    try:
+        if path == '/health':
+            if method != 'GET':
+                raise RequestError(405, "Method not allowed")
+            start_service()
+            await send_json(send, 200, {'status': 'ok', 'reference_version': service_state['reference_version']})
+            return
+
+        if path != '/classify':
+            raise RequestError(404, "Not found")
+        if method != 'POST':
+            raise RequestError(405, "Method not allowed")
+
+        start_service()
+        args = parse_classify_request(scope, await read_body(receive))
+        # Classification runs in the process pool, the event loop keeps accepting requests
+        loop = asyncio.get_running_loop()
+        pool = service_state['pool']
+        try:
+            result = await loop.run_in_executor(pool, classify_request, *args)
+        except BrokenProcessPool:
+            # A worker process died: drop the pool without waiting (concurrent requests may have
+            # dropped it already), the next request starts a new one
+            if service_state['pool'] is pool:
+                stop_service(wait=False)
+            raise RequestError(500, "Worker process failed")
+        except (BadZipFile, InvalidFileException) as e:
+            raise RequestError(422, f"Not a valid .xlsx file: {e}")
+        except ValueError as e:
+            # Unknown Excel format, missing combinations
+            raise RequestError(422, f"{type(e).__name__}: {e}")
+        await send_json(send, 200, result)
+
+    except RequestError as e:
+        await send_json(send, e.status, {'error': str(e)})
+    except Exception as e:
+        # Any other failure (worker or server) still gets a JSON body
+        await send_json(send, 500, {'error': f"{type(e).__name__}: {e}"})
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                start_service()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Waiting for the workers runs in a thread, the event loop stays free
+            await asyncio.to_thread(stop_service)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+    elif scope['type'] == 'http':
+        await handle_http(scope, receive, send)
+
+############################################################
+#END HTTP PART OF CODE
+############################################################
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="BMF Klassifizierung als HTTP Dienst")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help="Prozesse für die Klassifizierung (Standard: CPU Anzahl)")
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        os.environ['BMF_SERVICE_WORKERS'] = str(args.workers)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# Shared fixtures: the reference tables and synthetic Agrolab-like reports
+# Usage: python -m pytest                      (all tests with the benchmark cases of test_performance.py)
+#        python -m pytest --benchmark-disable  (the benchmark cases run only once)
+import os
+
+import pytest
+
+from reference import load_reference
+from benchmarks.synthetic import write_report, threshold_values
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-golden', action='store_true', help="Golden Datei neu schreiben")
+
+
+@pytest.fixture(scope='session')
+def reference():
+    return load_reference()
+
+
+@pytest.fixture(scope='session')
+def thresholds():
+    return threshold_values()
+
+
+# make_report(layout, n_samples, seed, distribution) -> path of the xlsx file,
+# every report is written once per test session
+@pytest.fixture(scope='session')
+def make_report(tmp_path_factory, thresholds):
+    directory = tmp_path_factory.mktemp('reports')
+    paths = {}
+
+    def make(layout='multi', n_samples=1, seed=0, distribution='uniform'):
+        key = (layout, n_samples, seed, distribution)
+        if key not in paths:
+            path = os.path.join(directory, f"{layout}_{n_samples}_{seed}_{distribution}.xlsx")
+            paths[key] = write_report(path, layout, n_samples, seed=seed, distribution=distribution,
+                                      thresholds=thresholds)
+        return paths[key]
+
+    return make
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from classification import compile_classification_table, sample_context, classify_bmf
+from reference import load_pickles
+from benchmarks.legacy import legacy_apply_classify_bmf
+from benchmarks.synthetic import threshold_edge_rows, edge_table
+
+
+@pytest.fixture(scope='module')
+def classification_table():
+    return load_pickles()[0]
+
+
+@pytest.fixture(scope='module')
+def edge_rows(classification_table):
+    return threshold_edge_rows(classification_table)
+
+
+# Compiled lookup against the original row-wise classify_bmf, at and around every threshold
+@pytest.mark.parametrize('toc', [None, 0.3, 0.5, 0.8, np.nan])
+@pytest.mark.parametrize('subcategory', ['Sand', 'Lehm Schluff', 'Ton', None])
+def test_classify_bmf_matches_legacy(classification_table, edge_rows, toc, subcategory):
+    compiled_table = compile_classification_table(classification_table)
+    df = edge_table(edge_rows, toc)
+    expected = legacy_apply_classify_bmf(df, classification_table, subcategory=subcategory)
+    result = classify_bmf(df, compiled_table, sample_context(df, subcategory))
+    mismatch = expected['BMF_primär'].to_numpy() != result['BMF_primär'].to_numpy()
+    assert not mismatch.any(), df.assign(expected=expected['BMF_primär'], result=result['BMF_primär'])[mismatch]
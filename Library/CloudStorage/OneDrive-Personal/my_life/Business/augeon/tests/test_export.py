@@ -0,0 +1,56 @@
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from export import write_tables, with_probe, write_excel, class_rules, csv_bytes, parquet_bytes, excel_bytes
+from ingestion import read_report
+from pipeline import classify_report
+
+
+@pytest.fixture(scope='module')
+def final_dfs(make_report, reference):
+    return classify_report(read_report(make_report('multi', 6, seed=1, distribution='thresholds')), reference)
+
+
+# Same values, typed and categorical columns
+def test_parquet_round_trip(final_dfs):
+    back = pd.read_parquet(io.BytesIO(parquet_bytes(final_dfs)))
+    expected = pd.concat(list(with_probe(final_dfs)), ignore_index=True)
+    assert list(back.columns) == list(expected.columns)
+    for column in expected.columns:
+        assert back[column].isna().equals(expected[column].isna()), column
+        assert (back[column].dropna().astype(str).values == expected[column].dropna().astype(str).values).all(), column
+    assert back['BMF_primär'].cat.ordered and back['Menge'].dtype == float
+
+
+def test_csv_streamed_like_concat(final_dfs, tmp_path):
+    path = str(tmp_path / 'result.csv')
+    write_tables(iter(final_dfs), path, 'csv')
+    expected = pd.concat(final_dfs, ignore_index=True).to_csv(index=False)
+    with open(path, encoding='utf-8', newline='') as file:
+        assert file.read() == expected
+    assert csv_bytes(final_dfs).decode('utf-8') == expected
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="Unknown export format"):
+        write_tables([], str(tmp_path / 'result.txt'), 'txt')
+
+
+# One sheet per sample with the class colours
+def test_excel_sheets(final_dfs):
+    workbook = load_workbook(io.BytesIO(excel_bytes(final_dfs)))
+    assert workbook.sheetnames == [f"Probe {i + 1}" for i in range(len(final_dfs))]
+    for sheet, final_df in zip(workbook.worksheets, final_dfs):
+        assert sheet.max_row == len(final_df) + 1
+        assert [cell.value for cell in sheet[1]] == list(final_df.columns)
+        assert sum(len(entry.rules) for entry in sheet.conditional_formatting) == len(class_rules())
+        assert all(len(entry.sqref.ranges) == 3 for entry in sheet.conditional_formatting)
+
+
+def test_excel_without_samples(tmp_path):
+    path = str(tmp_path / 'empty.xlsx')
+    write_excel([], path)
+    assert load_workbook(path).sheetnames == ["Keine Proben"]
@@ -0,0 +1,76 @@
+# Golden output: the BMF columns for a fixed set of synthetic reports (all layouts, value
+# distributions and subcategories) have to stay exactly the same across rewrites.
+# After an intended change: python -m pytest tests/test_golden.py --update-golden
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from ingestion import read_report
+from pipeline import classify_report
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'bmf_golden.csv')
+
+golden_columns = ['Fall', 'Probe', 'Stoff', 'Aggregat', 'Menge', 'BMF_primär', 'BMF_sekundär', 'Relevante_Klassen']
+
+# (layout, samples, distribution); every report is classified with all three subcategories
+report_cases = [
+    ('row7', 1, 'thresholds'),
+    ('row10', 1, 'thresholds'),
+    ('mantelv', 1, 'thresholds'),
+    ('multi', 8, 'thresholds'),
+    ('multi', 4, 'uniform'),
+    ('mantelv', 1, 'uniform'),
+    ('multi', 3, 'clean'),
+]
+subcategories = ['Sand', 'Lehm Schluff', 'Ton']
+
+
+def golden_frame(results):
+    golden = pd.concat(results, ignore_index=True)[golden_columns]
+    # Compared as text exactly like it is stored
+    return pd.read_csv(io.StringIO(golden.to_csv(index=False)), dtype=str, keep_default_na=False)
+
+
+def current_results(reports, reference, **kwargs):
+    results = []
+    for name, dataframes in reports:
+        for subcategory in subcategories:
+            final_dfs = classify_report(dataframes, reference, subcategory=subcategory, **kwargs)
+            for idx, final_df in enumerate(final_dfs):
+                final_df.insert(0, 'Probe', idx + 1)
+                final_df.insert(0, 'Fall', f"{name} {subcategory}")
+                results.append(final_df)
+    return golden_frame(results)
+
+
+# Same seed -> same file content
+@pytest.fixture(scope='module')
+def case_reports(make_report):
+    reports = []
+    for seed, (layout, n_samples, distribution) in enumerate(report_cases):
+        path = make_report(layout, n_samples, seed=seed, distribution=distribution)
+        reports.append((f"{seed:02d}_{layout}_{distribution}_{n_samples}.xlsx", read_report(path)))
+    return reports
+
+
+@pytest.fixture(scope='module')
+def current(case_reports, reference):
+    return current_results(case_reports, reference)
+
+
+def test_columnar_matches_per_sample(case_reports, reference, current):
+    pd.testing.assert_frame_equal(current, current_results(case_reports, reference, columnar=False))
+
+
+def test_golden_output(current, request):
+    if request.config.getoption('--update-golden'):
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        current.to_csv(GOLDEN_PATH, index=False)
+        pytest.skip(f"Written {len(current)} rows to {GOLDEN_PATH}")
+
+    expected = pd.read_csv(GOLDEN_PATH, dtype=str, keep_default_na=False)
+    assert current.shape == expected.shape
+    diff = current.compare(expected, result_names=('aktuell', 'golden'))
+    assert diff.empty, f"Golden output changed in {len(diff)} rows:\n{diff.head(20).to_string()}"
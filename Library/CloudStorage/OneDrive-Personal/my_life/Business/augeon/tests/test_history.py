@@ -0,0 +1,84 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from export import with_probe
+from history import open_history, close_history, record_report, query_history, history_stoffe, history_counts
+from ingestion import read_report
+from pipeline import classify_report
+
+
+@pytest.fixture(scope='module')
+def results(make_report, reference):
+    final_dfs = classify_report(read_report(make_report('multi', 4, seed=2, distribution='thresholds')), reference)
+    return pd.concat(with_probe(final_dfs), ignore_index=True)
+
+
+@pytest.fixture
+def history(tmp_path, results, reference):
+    history = open_history(str(tmp_path / 'history.sqlite'))
+    for idx, classified_at in enumerate(pd.date_range('2025-01-01', periods=4, freq='90D')):
+        record_report(history, results, f"hash-{idx}", 'Sand', True, reference['version'],
+                      file_name=f"bericht_{idx}.xlsx", classified_at=classified_at)
+    yield history
+    close_history(history)
+
+
+def test_record_once(history, results, reference):
+    # Stored twice with the same parameters: kept once
+    assert record_report(history, results, "hash-0", 'Sand', True, reference['version']) is None
+    assert record_report(history, results, "hash-0", 'Ton', True, reference['version']) is not None
+    assert history_counts(history) == {'reports': 5, 'rows': 5 * len(results)}
+
+
+# Stored and read back: same classes as the pipeline returned
+def test_round_trip(history, results):
+    found = query_history(history, report_hash='hash-2')
+    assert (found['Datei'] == 'bericht_2.xlsx').all()
+    assert found['Probe'].tolist() == results['Probe'].tolist()
+    for label in ['BMF_primär', 'BMF_sekundär', 'Relevante_Klassen']:
+        pd.testing.assert_series_equal(found[label], results[label], check_names=False)
+    assert history_stoffe(history) == sorted(results['Stoff'].astype(str).unique())
+
+
+@pytest.mark.parametrize('filters', [
+    dict(above_class='BM-F1 BG-F1'),
+    dict(above_class='BM-0* BG-0*', column='BMF_primär'),
+    dict(stoff='Arsen (As)', since='2025-03-01'),
+    dict(since='2025-03-01', until='2025-09-01'),
+])
+def test_query_filters(history, results, filters):
+    stored = query_history(history)
+    mask = pd.Series(True, index=stored.index)
+    if 'stoff' in filters:
+        mask &= stored['Stoff'] == filters['stoff']
+    if 'above_class' in filters:
+        column = filters.get('column', 'Relevante_Klassen')
+        mask &= stored[column] > filters['above_class']
+    if 'since' in filters:
+        mask &= stored['Datum'] >= pd.Timestamp(filters['since'])
+    if 'until' in filters:
+        mask &= stored['Datum'] < pd.Timestamp(filters['until'])
+
+    found = query_history(history, **filters)
+    assert len(found) == mask.sum() > 0
+    # Newest results first
+    assert found['Datum'].is_monotonic_decreasing
+    assert len(query_history(history, limit=10, **filters)) == min(10, len(found))
+
+
+def test_invalid_filters(history):
+    with pytest.raises(ValueError, match="Unknown BMF class"):
+        query_history(history, above_class='BM-F9')
+    with pytest.raises(ValueError, match="Unknown class column"):
+        query_history(history, column='Menge')
+
+
+def test_other_bmf_classes(tmp_path):
+    path = str(tmp_path / 'history.sqlite')
+    close_history(open_history(path))
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE meta SET value = '[]' WHERE key = 'bmf_classes'")
+    with pytest.raises(ValueError, match="bmf_classes"):
+        open_history(path)
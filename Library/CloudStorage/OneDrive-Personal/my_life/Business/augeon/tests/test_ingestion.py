@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from ingestion import read_report, parse_menge, stoff_dtype
+from benchmarks.legacy import legacy_read_report, clean_menge
+from benchmarks.synthetic import write_stale_dimension
+
+
+def assert_same_as_legacy(expected, result):
+    assert len(expected) == len(result)
+    for old, new in zip(expected, result):
+        new = new.drop(columns='Qualifier').astype({'Stoff': object, 'Aggregat': object})
+        pd.testing.assert_frame_equal(old, new, check_dtype=False)
+
+
+@pytest.mark.parametrize('layout, n_samples', [('row7', 1), ('row10', 1), ('mantelv', 1), ('multi', 1), ('multi', 5)])
+def test_read_report_matches_legacy(make_report, layout, n_samples):
+    path = make_report(layout, n_samples)
+    assert_same_as_legacy(legacy_read_report(path), read_report(path))
+
+
+def test_read_report_from_upload(make_report):
+    path = make_report('multi', 3)
+    with open(path, 'rb') as file:
+        upload = io.BytesIO(file.read())
+    upload.seek(100)
+    result = read_report(upload)
+    assert len(result) == 3
+    assert result[0]['Stoff'].dtype == stoff_dtype
+
+
+# Non-Excel writers often leave <dimension ref="A1"/>, the sheet still has to be read completely
+def test_stale_dimension(make_report, tmp_path):
+    path = make_report('multi', 3)
+    stale_path = write_stale_dimension(path, str(tmp_path / 'stale.xlsx'))
+    expected, result = read_report(path), read_report(stale_path)
+    assert len(result) == 3
+    for old, new in zip(expected, result):
+        pd.testing.assert_frame_equal(old, new)
+
+
+def test_unknown_format(tmp_path):
+    path = str(tmp_path / 'unknown.xlsx')
+    workbook = Workbook()
+    workbook.active['A1'] = "Kein Prüfbericht"
+    workbook.save(path)
+    with pytest.raises(ValueError, match="Unknown Excel format"):
+        read_report(path)
+
+
+cells = ['<0,5', '<= 3,2', '≥10', ' > 7 ', '12,75', '0,034', 'n.n.', '', None, np.nan, 5, 7.5, '=4', '>=1,5', '≤ 0,01']
+
+
+def test_parse_menge_matches_clean_menge():
+    column = pd.Series(cells * 3, dtype=object)
+    menge, qualifier = parse_menge(column)
+    pd.testing.assert_series_equal(column.apply(clean_menge).astype(float), menge, check_names=False)
+    assert qualifier.tolist()[:len(cells)] == ['<', '≤', '≥', '>', None, None, None, None, None, None, None, None, None,
+                                               '≥', '≤']
+
+
+# Worst case for the per-distinct-cell parsing: (almost) every cell is distinct
+def test_parse_menge_distinct_cells():
+    rng = np.random.default_rng(0)
+    prefixes = np.array(['', '<', '>', '<=', '≥', '=', ' '], dtype=object)
+    numbers = pd.Series(rng.uniform(0, 1000, 5000).round(4)).astype(str).str.replace('.', ',', regex=False)
+    column = pd.Series(prefixes[rng.integers(0, len(prefixes), len(numbers))] + numbers.to_numpy(dtype=object))
+    menge, _ = parse_menge(column)
+    pd.testing.assert_series_equal(column.apply(clean_menge).astype(float), menge, check_names=False)
+
+
+# Numeric and text cells give the same Qualifier column: object dtype, None without a qualifier
+def test_parse_menge_numeric():
+    menge, qualifier = parse_menge(pd.Series([1, 2.5, np.nan]))
+    assert menge.dtype == float
+    text_qualifier = parse_menge(pd.Series(['1', '2,5', None]))[1]
+    assert qualifier.dtype == text_qualifier.dtype == object
+    assert qualifier.tolist() == text_qualifier.tolist() == [None, None, None]
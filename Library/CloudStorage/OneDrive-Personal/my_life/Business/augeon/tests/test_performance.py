@@ -0,0 +1,38 @@
+# pytest-benchmark cases for the main stages: ingestion, classification and end to end
+#   python -m pytest tests/test_performance.py --benchmark-only
+#   python -m pytest tests/test_performance.py --benchmark-only --benchmark-compare   (against the last --benchmark-autosave)
+import pytest
+
+from classification import sample_context, classify_bmf
+from ingestion import read_report
+from pipeline import classify_report
+from reference import get_compiled_table, load_pickles
+from benchmarks.synthetic import threshold_edge_rows, edge_table
+
+
+@pytest.mark.parametrize('layout, n_samples', [('row10', 1), ('multi', 10)])
+def test_read_report(benchmark, make_report, layout, n_samples):
+    path = make_report(layout, n_samples)
+    dataframes = benchmark(read_report, path)
+    assert len(dataframes) == n_samples
+
+
+def test_classify_bmf(benchmark, reference):
+    rows = threshold_edge_rows(load_pickles()[0])
+    df = edge_table(rows * 20, toc=0.8)
+    compiled_table = get_compiled_table(reference)
+    result = benchmark(lambda: classify_bmf(df, compiled_table, sample_context(df, 'Sand')))
+    assert len(result) == len(df)
+
+
+@pytest.mark.parametrize('columnar', [True, False])
+def test_classify_report(benchmark, make_report, reference, columnar):
+    dataframes = read_report(make_report('multi', 20, distribution='thresholds'))
+    final_dfs = benchmark(classify_report, dataframes, reference, columnar=columnar)
+    assert len(final_dfs) == 20
+
+
+def test_end_to_end(benchmark, make_report, reference):
+    path = make_report('multi', 20, distribution='thresholds')
+    final_dfs = benchmark(lambda: classify_report(read_report(path), reference, subcategory='Ton'))
+    assert len(final_dfs) == 20
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from classification import sample_context, classify_bmf, bmf_classes, bmf_class_dtype
+from ingestion import read_report
+from pipeline import classify_report, iter_classify_report, sample_summary
+from pipeline import initial_state, eluat_klausel, f_klausel, erste_relevanzprüfung
+from reference import get_compiled_table, get_smallest_bmf
+from benchmarks.legacy import classify_after_trigger
+from benchmarks.synthetic import trigger_and_clean_samples
+
+
+@pytest.fixture(scope='module')
+def mixed_samples(tmp_path_factory):
+    return trigger_and_clean_samples(str(tmp_path_factory.mktemp('mixed')), 8)
+
+
+@pytest.mark.parametrize('kwargs', [{'columnar': False}, {'max_workers': 4}, {}])
+def test_no_trigger_leaks(mixed_samples, reference, kwargs):
+    results = classify_report(mixed_samples, reference, subcategory='Sand', **kwargs)
+    for idx, result in enumerate(results):
+        alone = classify_report([mixed_samples[idx]], reference, subcategory='Sand', columnar=False)[0]
+        pd.testing.assert_frame_equal(alone, result)
+
+        if idx % 2 == 1:
+            # The clean sample follows a triggering one: a leaked trigger would have changed it
+            assert (results[idx - 1]['Relevante_Klassen'] != '').any()
+            assert (alone['Relevante_Klassen'] == '').all()
+            leaked = classify_after_trigger(mixed_samples[idx], reference)
+            assert not leaked['Relevante_Klassen'].equals(alone['Relevante_Klassen'])
+
+
+def test_missing_combinations(reference):
+    stoff, aggregat = get_smallest_bmf(reference).index[0]
+    sample = pd.DataFrame({'Stoff': [stoff], 'Aggregat': [aggregat], 'Menge': [1.0]})
+    with pytest.raises(ValueError, match="^Missing combinations"):
+        classify_report([sample], reference)
+    with pytest.raises(ValueError, match="^Missing combinations"):
+        next(iter_classify_report([sample], reference))
+
+
+def test_iter_classify_report(make_report, reference):
+    dataframes = read_report(make_report('multi', 20, seed=3, distribution='thresholds'))
+    expected = classify_report(dataframes, reference, subcategory='Ton')
+    streamed = list(iter_classify_report(dataframes, reference, subcategory='Ton', max_chunk_size=4))
+    assert [idx for idx, _ in streamed] == list(range(len(expected)))
+    for old, (_, new) in zip(expected, streamed):
+        pd.testing.assert_frame_equal(old, new)
+
+
+def test_sample_summary(make_report, reference):
+    final_df = classify_report(read_report(make_report('multi', 1, distribution='thresholds')), reference)[0]
+    summary = sample_summary(0, final_df)
+    assert summary['Probe'] == 1
+    assert summary['Schlechteste_Klasse'] == final_df['Relevante_Klassen'].max()
+    assert summary['Relevante_Werte'] == int((final_df['Relevante_Klassen'] != '').sum())
+    assert summary['Höchste_BMF_primär'] in bmf_classes
+
+
+def as_object(df):
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+def run_clauses(df, reference, categorical):
+    context = sample_context(df, subcategory='Sand')
+    df = classify_bmf(df, get_compiled_table(reference), context)
+    df['BMF_sekundär'] = df['BMF_primär']
+    df['Relevante_Klassen'] = pd.Categorical([''] * len(df), dtype=bmf_class_dtype)
+    if not categorical:
+        df = as_object(df)
+    state = initial_state()
+    df, state = eluat_klausel(df, context, state)
+    df, state = f_klausel(df, context, state)
+    return erste_relevanzprüfung(df, context, state, get_smallest_bmf(reference))
+
+
+# The clauses give the same classes on categorical and on plain object (string) columns
+def test_clauses_on_object_columns(make_report, reference):
+    for df in read_report(make_report('multi', 4, seed=3, distribution='thresholds')):
+        result_cat = run_clauses(df, reference, categorical=True)
+        result_obj = run_clauses(as_object(df), reference, categorical=False)
+        pd.testing.assert_frame_equal(as_object(result_cat), result_obj)
@@ -0,0 +1,38 @@
+import json
+
+import pandas as pd
+
+from ingestion import read_report
+from pipeline import classify_report
+from profiling import new_profiler, profile_table, profile_summary, profile_json
+
+
+def test_profiled_results_unchanged(make_report, reference):
+    dataframes = read_report(make_report('multi', 4, seed=1))
+    expected = classify_report(dataframes, reference)
+    for columnar in [True, False]:
+        result = classify_report(dataframes, reference, columnar=columnar, profiler=new_profiler(trace_memory=True))
+        for old, new in zip(expected, result):
+            pd.testing.assert_frame_equal(old, new)
+
+
+def test_stage_records(make_report, reference):
+    path = make_report('multi', 4, seed=1)
+    profiler = new_profiler(trace_memory=True)
+    classify_report(read_report(path, profiler=profiler), reference, columnar=False, profiler=profiler)
+
+    table = profile_table(profiler)
+    assert table['seconds'].notna().all() and table['peak_bytes'].notna().all()
+    assert set(table.loc[table['probe'].notna(), 'probe']) == {1, 2, 3, 4}
+    assert table.loc[table['stage'] == 'read_sheet_rows', 'rows'].iloc[0] > 0
+
+    summary = profile_summary(profiler)
+    assert summary['seconds'].is_monotonic_decreasing
+    assert summary.loc[summary['stage'] == 'classify_bmf', 'calls'].iloc[0] == 4
+    assert json.loads(profile_json(profiler, file='report.xlsx'))['file'] == 'report.xlsx'
+
+
+def test_timings_only(make_report, reference):
+    profiler = new_profiler()
+    classify_report(read_report(make_report('multi', 2), profiler=profiler), reference, profiler=profiler)
+    assert profile_table(profiler)['peak_bytes'].isna().all()
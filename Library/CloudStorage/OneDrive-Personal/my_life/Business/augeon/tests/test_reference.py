@@ -0,0 +1,138 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reference import ARTIFACT_NAME, BASE_DIR, PICKLE_NAMES, build_artifact, load_artifact, load_reference
+from reference import get_compiled_table, get_smallest_bmf, load_pickles, reference_from_pickles
+from reference import source_hash, validate_reference_tables
+
+
+@pytest.fixture
+def tables():
+    return copy.deepcopy(load_pickles())
+
+
+def first_entry(table):
+    for stoff, aggregate in table.items():
+        for aggregat, stoff_agg in aggregate.items():
+            if 'thresholds' in stoff_agg:
+                return stoff_agg
+            return next(iter(stoff_agg.values()))
+
+
+def test_valid_tables(tables):
+    validate_reference_tables(*tables)
+
+
+def reverse_thresholds(classification_table, complete_df_stoffe):
+    entry = first_entry(classification_table)
+    entry['thresholds'] = list(entry['thresholds'])[::-1]
+
+
+def drop_classification(classification_table, complete_df_stoffe):
+    entry = first_entry(classification_table)
+    entry['classifications'] = list(entry['classifications'])[:-1]
+
+
+def drop_thresholds(classification_table, complete_df_stoffe):
+    del first_entry(classification_table)['thresholds']
+
+
+def drop_combination(classification_table, complete_df_stoffe):
+    stoff, aggregat, _ = complete_df_stoffe[0]
+    del classification_table[stoff][aggregat]
+
+
+# Every kind of broken reference table is rejected at load time, with the offending entry named
+@pytest.mark.parametrize('breakage, message', [
+    (reverse_thresholds, "not sorted ascending"),
+    (drop_classification, "classifications"),
+    (drop_thresholds, "needs 'thresholds' and 'classifications'"),
+    (drop_combination, "has no thresholds in classification_table"),
+])
+def test_invalid_tables(tables, breakage, message):
+    breakage(*tables)
+    with pytest.raises(ValueError, match="Invalid reference tables") as excinfo:
+        validate_reference_tables(*tables)
+    assert message in str(excinfo.value)
+
+
+@pytest.fixture(scope='module')
+def artifact_path(tmp_path_factory):
+    return build_artifact(path=str(tmp_path_factory.mktemp('artifact') / ARTIFACT_NAME))
+
+
+def test_artifact_matches_pickles(artifact_path):
+    from_pickles = reference_from_pickles()
+    from_artifact = load_artifact(artifact_path, expected_source_hash=source_hash())
+    assert from_pickles['version'] == from_artifact['version']
+
+    # The lookup structures are only built on first use
+    assert 'compiled_table' not in from_pickles and 'compiled_table' not in from_artifact
+    compiled_pickles, compiled_artifact = get_compiled_table(from_pickles), get_compiled_table(from_artifact)
+    assert compiled_pickles.keys() == compiled_artifact.keys()
+    for key, stoff_data in compiled_pickles.items():
+        other = compiled_artifact[key]
+        np.testing.assert_array_equal(stoff_data['thresholds'], other['thresholds'])
+        np.testing.assert_array_equal(stoff_data['classifications'], other['classifications'])
+        assert stoff_data['last_threshold'] == other['last_threshold']
+    pd.testing.assert_series_equal(get_smallest_bmf(from_pickles), get_smallest_bmf(from_artifact))
+
+
+def test_outdated_artifact(artifact_path):
+    with pytest.raises(ValueError):
+        load_artifact(artifact_path, expected_source_hash='0' * 64)
+
+
+@pytest.fixture
+def base_dir(tmp_path):
+    for name in PICKLE_NAMES:
+        with open(os.path.join(BASE_DIR, name), 'rb') as source, open(tmp_path / name, 'wb') as target:
+            target.write(source.read())
+    return str(tmp_path)
+
+
+# Rebuilding replaces the file: a process still mapping the old one keeps reading it
+def test_rebuild_keeps_old_mapping(base_dir):
+    path = build_artifact(base_dir=base_dir)
+    old_inode = os.stat(path).st_ino
+    mapped = load_artifact(path)
+    assert build_artifact(base_dir=base_dir) == path
+    assert os.stat(path).st_ino != old_inode
+    # No temporary file left behind
+    assert set(os.listdir(base_dir)) == set(PICKLE_NAMES + [ARTIFACT_NAME])
+    for stoff_data in get_compiled_table(mapped).values():
+        assert np.isfinite(stoff_data['thresholds']).all()
+
+
+def outdated_pickles(base_dir):
+    with open(os.path.join(base_dir, PICKLE_NAMES[1]), 'ab') as file:
+        file.write(b'\n')
+
+
+def half_written(base_dir):
+    path = os.path.join(base_dir, ARTIFACT_NAME)
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(data[:len(data) // 2])
+
+
+def unreadable(base_dir):
+    path = os.path.join(base_dir, ARTIFACT_NAME)
+    os.remove(path)
+    os.mkdir(path)
+
+
+# A broken artifact next to the pickles: load_reference warns and falls back to the pickles
+@pytest.mark.parametrize('breakage', [outdated_pickles, half_written, unreadable])
+def test_load_reference_fallback(base_dir, breakage):
+    build_artifact(base_dir=base_dir)
+    assert load_reference(base_dir)['source'] == 'artifact'
+
+    breakage(base_dir)
+    with pytest.warns(RuntimeWarning, match="loading the pickles instead"):
+        assert load_reference(base_dir)['source'] == 'pickle'
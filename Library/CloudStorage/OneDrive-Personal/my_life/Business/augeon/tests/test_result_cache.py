@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+import pytest
+
+from ingestion import read_report
+from pipeline import classify_report
+from result_cache import open_cache, cached_classify_report, iter_cached_classify_report, cache_entries
+
+
+@pytest.fixture(scope='module')
+def file_bytes(make_report):
+    with open(make_report('multi', 6, seed=1), 'rb') as file:
+        return file.read()
+
+
+def test_cold_and_warm(tmp_path, make_report, file_bytes, reference):
+    cache = open_cache(str(tmp_path))
+    expected = classify_report(read_report(make_report('multi', 6, seed=1)), reference, subcategory='Ton',
+                               fremdbestandteile_under_10=False)
+    cold = cached_classify_report(cache, file_bytes, reference, 'Ton', False)
+    warm = cached_classify_report(cache, file_bytes, reference, 'Ton', False)
+    # Other parameters: the parsed tables come from the cache, only the classification runs
+    cached_classify_report(cache, file_bytes, reference, 'Sand', True)
+
+    for old, new_cold, new_warm in zip(expected, cold, warm):
+        pd.testing.assert_frame_equal(old, new_cold)
+        pd.testing.assert_frame_equal(old, new_warm)
+    assert cache['stats'] == {'parsed': {'hits': 1, 'misses': 1}, 'results': {'hits': 1, 'misses': 2}}
+
+
+# Only complete results are stored
+def test_partial_iteration_not_stored(tmp_path, file_bytes, reference):
+    cache = open_cache(str(tmp_path))
+    n_samples, results = iter_cached_classify_report(cache, file_bytes, reference)
+    assert n_samples == 6
+    next(results)
+    assert [path for _, _, path in cache_entries(cache) if os.path.basename(path).startswith('result-')] == []
+
+
+# Room for about two entries, the least recently used ones go first
+def test_eviction(tmp_path, file_bytes, reference):
+    cache = open_cache(str(tmp_path / 'large'))
+    cached_classify_report(cache, file_bytes, reference, 'Ton', True)
+    entry_size = max(size for _, size, _ in cache_entries(cache))
+
+    small = open_cache(str(tmp_path / 'small'), max_bytes=2 * entry_size + 1)
+    for subcategory in ['Sand', 'Lehm Schluff', 'Ton']:
+        cached_classify_report(small, file_bytes, reference, subcategory, True)
+    assert sum(size for _, size, _ in cache_entries(small)) <= small['max_bytes']
+    hits = small['stats']['results']['hits']
+    cached_classify_report(small, file_bytes, reference, 'Ton', True)
+    assert small['stats']['results']['hits'] == hits + 1
+
+
+def test_unreadable_entry(tmp_path, file_bytes, reference):
+    cache = open_cache(str(tmp_path))
+    cached_classify_report(cache, file_bytes, reference)
+    for _, _, path in cache_entries(cache):
+        with open(path, 'wb') as file:
+            file.write(b'kaputt')
+    result = cached_classify_report(cache, file_bytes, reference)
+    assert len(result) == 6
+    assert cache['stats']['results']['misses'] == 2
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+import service
+from ingestion import read_report
+from pipeline import classify_report
+from service import app, start_service, stop_service, table_records
+
+xlsx_type = b'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+# One request through the ASGI app -> (status, JSON body)
+def call(method, path, body=b'', content_type=xlsx_type, query=b''):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(b'content-type', content_type)]}
+    asyncio.run(app(scope, receive, send))
+    start, response = sent
+    assert dict(start['headers'])[b'content-type'].startswith(b'application/json')
+    return start['status'], json.loads(response['body'])
+
+
+@pytest.fixture(scope='module', autouse=True)
+def running_service():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('BMF_SERVICE_WORKERS', '1')
+        start_service()
+        yield
+        stop_service()
+
+
+def test_health(reference):
+    assert call('GET', '/health') == (200, {'status': 'ok', 'reference_version': reference['version']})
+
+
+def test_classify_xlsx(make_report, reference):
+    path = make_report('multi', 3, distribution='thresholds')
+    with open(path, 'rb') as file:
+        status, body = call('POST', '/classify', file.read(), query=b'subcategory=Ton&fremdbestandteile=no')
+    assert status == 200
+    assert (body['subcategory'], body['fremdbestandteile_under_10']) == ('Ton', False)
+
+    expected = classify_report(read_report(path), reference, subcategory='Ton', fremdbestandteile_under_10=False)
+    assert [sample['Probe'] for sample in body['samples']] == [1, 2, 3]
+    for sample, final_df in zip(body['samples'], expected):
+        assert sample['rows'] == json.loads(json.dumps(table_records(final_df)))
+
+
+def test_classify_json_rows(make_report, reference):
+    dataframes = read_report(make_report('multi', 1))
+    rows = dataframes[0][['Stoff', 'Aggregat', 'Menge']].astype(object).where(dataframes[0].notna(), None)
+    status, body = call('POST', '/classify', json.dumps({'samples': [rows.to_dict('records')]}).encode(),
+                        content_type=b'application/json')
+    assert status == 200
+    result = pd.DataFrame(body['samples'][0]['rows'])
+    expected = classify_report(dataframes, reference)[0]
+    assert result['BMF_primär'].tolist() == expected['BMF_primär'].astype(str).tolist()
+
+
+@pytest.mark.parametrize('method, path, body, content_type, query, status', [
+    ('GET', '/unknown', b'', xlsx_type, b'', 404),
+    ('GET', '/classify', b'', xlsx_type, b'', 405),
+    ('POST', '/classify', b'', xlsx_type, b'', 400),
+    ('POST', '/classify', b'{"samples": ', b'application/json', b'', 400),
+    ('POST', '/classify', b'{"samples": [[]]}', b'application/json', b'subcategory=Kies', 400),
+    ('POST', '/classify', b'{"samples": [[]]}', b'application/json', b'fremdbestandteile=vielleicht', 400),
+    # Not an xlsx file and missing combinations (422), rows with values of the wrong type (400)
+    ('POST', '/classify', b'kein xlsx', xlsx_type, b'', 422),
+    ('POST', '/classify', b'{"samples": [[{"Stoff": "Arsen (As)", "Aggregat": "mg/kg", "Menge": 1}]]}',
+     b'application/json', b'', 422),
+    ('POST', '/classify', b'{"samples": [[{"Stoff": "Arsen (As)", "Aggregat": "mg/kg", "Menge": {"a": 1}}]]}',
+     b'application/json', b'', 400),
+    ('POST', '/classify', b'{"samples": [[{"Stoff": 1, "Aggregat": "mg/kg", "Menge": 1}]]}', b'application/json', b'', 400),
+    ('POST', '/classify', b'{"samples": [[{"Stoff": "Arsen (As)", "Menge": 1}]]}', b'application/json', b'', 400),
+    ('POST', '/classify', b'{"samples": [["Arsen (As)", "mg/kg", 1]]}', b'application/json', b'', 400),
+])
+def test_errors(method, path, body, content_type, query, status):
+    response_status, response = call(method, path, body, content_type=content_type, query=query)
+    assert response_status == status
+    assert response['error']
+
+
+def test_unexpected_error(monkeypatch):
+    def broken():
+        raise RuntimeError("reference tables missing")
+
+    monkeypatch.setattr(service, 'start_service', broken)
+    assert call('GET', '/health') == (500, {'error': "RuntimeError: reference tables missing"})
+
+
+def test_broken_pool_is_replaced():
+    # Worker processes exit on start, the request fails and the next one gets a new pool
+    stop_service()
+    service.service_state['pool'] = ProcessPoolExecutor(max_workers=1, initializer=os._exit, initargs=(1,))
+    assert call('POST', '/classify', b'{"samples": [[]]}', content_type=b'application/json') == \
+        (500, {'error': "Worker process failed"})
+    assert service.service_state['pool'] is None
+    assert call('GET', '/health')[0] == 200
+    assert service.service_state['pool'] is not None
@@ -0,0 +1,8 @@
+from reference import load_reference
+from workers import init_worker, worker_reference, worker_state
+
+
+def test_worker_reference(monkeypatch):
+    monkeypatch.setitem(worker_state, 'reference', None)
+    init_worker()
+    assert worker_reference()['version'] == load_reference()['version']
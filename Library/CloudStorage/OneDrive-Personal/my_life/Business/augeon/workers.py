@@ -0,0 +1,14 @@
+# Worker process setup shared by the process pools of batch.py and service.py:
+# every worker loads the reference tables once (init_worker) and keeps them for all its tasks
+from reference import load_reference
+
+# Reference tables of this worker process
+worker_state = {'reference': None}
+
+
+def init_worker():
+    worker_state['reference'] = load_reference()
+
+
+def worker_reference():
+    return worker_state['reference']